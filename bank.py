@@ -1,9 +1,14 @@
 import discord
 from discord.ext import commands, tasks
 import os
-import json
-import matplotlib.pyplot as plt
+import orjson
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import StrMethodFormatter
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import re
@@ -11,6 +16,15 @@ import asyncio
 import aiohttp
 import time
 import math
+import shelve
+import functools
+import operator
+import heapq
+import bisect
+from collections import namedtuple
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,70 +32,136 @@ load_dotenv()
 # Get Discord token and API key from environment variables
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 PNW_API_KEY = os.getenv('PNW_API_KEY')
+# Request budget of the API key (per minute), used to size the token bucket
+PNW_API_REQUESTS_PER_MINUTE = int(os.getenv('PNW_API_REQUESTS_PER_MINUTE', '60'))
 
 # Base URL for Politics and War API
 PNW_API_BASE_URL = "https://api.politicsandwar.com/graphql"
 
-# File to store bank and member resources history data
+# File to store bank history settings (alliance ID)
 BANK_HISTORY_FILE = "bank_history.json"
+# Bank records, one JSON record per line (appended on each $get_bank)
+BANK_RECORDS_FILE = "bank_records.jsonl"
+# Member resources snapshots, one JSON record per line (appended hourly)
+MEMBER_RESOURCES_FILE = "member_resources_records.jsonl"
 MARKET_PRICES_CACHE_FILE = "market_prices_cache.json"
+# History files are written compact; set PRETTY_HISTORY_JSON=1 to indent them for debugging
+HISTORY_JSON_OPTIONS = orjson.OPT_INDENT_2 if os.getenv('PRETTY_HISTORY_JSON') == '1' else 0
 
 # Fichier pour stocker l'historique des taxes
 TAX_HISTORY_FILE = "tax_history.json"
+# Colonnes des enregistrements fiscaux agrégées par jour (l'argent en premier)
+TAX_RESOURCES = ["money", "coal", "oil", "uranium", "iron", "bauxite", "lead", "gasoline", "munitions", "steel", "aluminum", "food"]
+
+# Cache disque des données de nation (shelve) et sa durée de validité en secondes
+NATION_CACHE_FILE = "nation_cache.db"
+NATION_CACHE_TTL = 300
+
+# Durée de validité (secondes) des informations de jeu et des bonus de couleur en mémoire
+GAME_INFO_TTL = 1800
+COLOR_DATA_TTL = 3600
+
+# Durée de validité (secondes) des prix du marché, en mémoire comme dans MARKET_PRICES_CACHE_FILE
+MARKET_PRICES_TTL = 7200
+
+# Durée de validité (secondes) des données fiscales traitées, partagées entre les commandes tax_*
+TAX_DATA_TTL = 300
+
+# Limites des réponses de l'API : délai par requête et taille maximale du corps
+API_TIMEOUT = aiohttp.ClientTimeout(total=10, sock_read=5)
+BULK_API_TIMEOUT = aiohttp.ClientTimeout(total=60, sock_read=30)  # Requêtes portant sur toute une alliance
+MAX_RESPONSE_BYTES = 8 * 1024 * 1024
+BULK_MAX_RESPONSE_BYTES = 128 * 1024 * 1024  # Réponses des requêtes BULK_API_TIMEOUT
 
 class PnwApiLimiter:
     """
     Rate limiter for Politics & War API requests.
     Ensures requests don't exceed the rate limit (typically 60 requests per minute).
+    
+    Implemented as a token bucket refilled continuously at requests_per_minute / 60
+    tokens per second. The lock only guards the token accounting, so requests
+    themselves run concurrently as long as they stay within the budget.
     """
     def __init__(self, requests_per_minute=60):
         self.requests_per_minute = requests_per_minute
-        self.request_times = []
+        self.rate = requests_per_minute / 60
+        self.capacity = requests_per_minute
+        self.tokens = float(requests_per_minute)
+        self.last_refill = time.monotonic()
         self.lock = asyncio.Lock()
     
-    async def execute_request(self, session, url, payload, headers):
-        """
-        Execute an API request while respecting rate limits.
-        
-        Args:
-            session: aiohttp ClientSession
-            url: API endpoint URL
-            payload: Request payload
-            headers: Request headers
-            
-        Returns:
-            dict: Response data from API
-        """
+    async def acquire(self):
+        """Wait until a request can be made without exceeding the rate limit."""
         async with self.lock:
-            # Remove request timestamps older than 60 seconds
-            current_time = time.time()
-            self.request_times = [t for t in self.request_times if current_time - t < 60]
+            # Refill the bucket for the time elapsed since the last request
+            current_time = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (current_time - self.last_refill) * self.rate)
+            self.last_refill = current_time
             
-            # If we've reached the rate limit, wait until we can make another request
-            if len(self.request_times) >= self.requests_per_minute:
-                # Calculate how long to wait
-                oldest_request = min(self.request_times)
-                wait_time = 60 - (current_time - oldest_request) + 0.1  # Add 0.1s buffer
-                
-                if wait_time > 0:
-                    print(f"Rate limit reached. Waiting {wait_time:.2f} seconds before next request.")
-                    await asyncio.sleep(wait_time)
-            
-            # Make the request and record the timestamp
-            self.request_times.append(time.time())
-            
-            try:
-                async with session.post(url, json=payload, headers=headers, timeout=30) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        print(f"API request failed with status code {response.status}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {e}")
-                return None
+            # Reserve a token; if none is available, wait until it has been refilled
+            wait_time = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+        
+        if wait_time > 0:
+            print(f"Rate limit reached. Waiting {wait_time:.2f} seconds before next request.")
+            await asyncio.sleep(wait_time)
+
+pnw_api_limiter = PnwApiLimiter(PNW_API_REQUESTS_PER_MINUTE)
 
-pnw_api_limiter = PnwApiLimiter()
+# Shared HTTP session for every Politics & War API call (created lazily on the running loop)
+_session = None
+
+async def get_session():
+    """
+    Return the shared aiohttp session, creating it on first use.
+    
+    Reusing one session keeps connections to the API alive between requests
+    instead of paying a new TCP/TLS handshake on every call.
+    The connector caps in-flight requests at 10; the rate itself is enforced by
+    pnw_api_limiter.
+    
+    Returns:
+        aiohttp.ClientSession: The shared session
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=10, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=75),
+            timeout=API_TIMEOUT,
+            json_serialize=lambda obj: orjson.dumps(obj).decode()
+        )
+    return _session
+
+async def close_session():
+    """Close the shared aiohttp session if it is open."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def read_json_response(response, max_bytes=MAX_RESPONSE_BYTES):
+    """
+    Read and decode a JSON response body, refusing bodies over max_bytes.
+    
+    The body is read chunk by chunk so an oversized response fails as soon as
+    the limit is crossed instead of being buffered in full first.
+    
+    Args:
+        response: aiohttp ClientResponse
+        max_bytes: Maximum accepted body size (defaults to MAX_RESPONSE_BYTES)
+        
+    Returns:
+        dict: Decoded response
+    """
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise aiohttp.ClientPayloadError(f"Response too large: {response.content_length} bytes")
+    
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body += chunk
+        if len(body) > max_bytes:
+            raise aiohttp.ClientPayloadError(f"Response exceeds {max_bytes} bytes")
+    return orjson.loads(body)
 
 # Default resource prices if API is unavailable
 DEFAULT_PRICES = {
@@ -103,7 +183,19 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.messages = True
 intents.guild_messages = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+class BankBot(commands.Bot):
+    """Discord bot that also owns the shared Politics & War HTTP session."""
+    async def setup_hook(self):
+        """Open the shared HTTP session at startup so the first command doesn't pay for it."""
+        await get_session()
+    
+    async def close(self):
+        """Close the shared HTTP session before shutting the bot down."""
+        await close_session()
+        await super().close()
+
+bot = BankBot(command_prefix='!', intents=intents)
 
 @bot.event
 async def on_ready():
@@ -113,20 +205,66 @@ async def on_ready():
     print(f'Use !scan_history to scan previous messages for $get_bank commands')
     hourly_member_resources_collection.start()
 
+# In-process copy of the market price cache; the file is only read when this is empty or stale
+_prices_cache = {"timestamp": 0, "prices": None}
+# Concurrent callers with a stale cache wait for a single refresh instead of each fetching
+_prices_lock = asyncio.Lock()
+
+def _cached_market_prices():
+    """Return the in-process market prices if they are still fresh, else None."""
+    if _prices_cache["prices"] is not None and time.time() - _prices_cache["timestamp"] < MARKET_PRICES_TTL:
+        return _prices_cache["prices"]
+    return None
+
 async def get_pnw_market_prices():
     """
     Fetches current market prices from the Politics & War GraphQL API (v3).
     Returns a dictionary of resource prices.
     """
+    prices = _cached_market_prices()
+    if prices is not None:
+        return prices
+    
+    async with _prices_lock:
+        # Another caller may have refreshed the prices while we were waiting
+        prices = _cached_market_prices()
+        if prices is not None:
+            return prices
+        return await _fetch_pnw_market_prices()
+
+MARKET_PRICES_QUERY = """
+query {
+    tradeprices(first: 1) {
+        data {
+            food
+            coal
+            oil
+            uranium
+            lead
+            iron
+            bauxite
+            gasoline
+            munitions
+            steel
+            aluminum
+        }
+    }
+}
+"""
+
+async def _fetch_pnw_market_prices():
+    """Load market prices from the cache file, or from the API when the file is stale."""
     if os.path.exists(MARKET_PRICES_CACHE_FILE):
         try:
-            with open(MARKET_PRICES_CACHE_FILE, 'r') as f:
-                cache_data = json.load(f)
+            with open(MARKET_PRICES_CACHE_FILE, 'rb') as f:
+                cache_data = orjson.loads(f.read())
                 cache_time = cache_data.get('timestamp', 0)
-                if time.time() - cache_time < 7200:
+                if time.time() - cache_time < MARKET_PRICES_TTL:
                     print("Using cached market prices")
-                    return cache_data.get('prices', DEFAULT_PRICES)
-        except (json.JSONDecodeError, KeyError):
+                    prices = cache_data.get('prices', DEFAULT_PRICES)
+                    _prices_cache.update(timestamp=cache_time, prices=prices)
+                    return prices
+        except (orjson.JSONDecodeError, KeyError):
             print("Cache file corrupted, will fetch new prices")
     
     if not PNW_API_KEY:
@@ -134,176 +272,194 @@ async def get_pnw_market_prices():
         return DEFAULT_PRICES
     
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.politicsandwar.com/graphql?api_key={PNW_API_KEY}"
-            query = """
-            query {
-              tradeprices {
-                data {
-                  food
-                  coal
-                  oil
-                  uranium
-                  lead
-                  iron
-                  bauxite
-                  gasoline
-                  munitions
-                  steel
-                  aluminum
-                }
-              }
-            }
-            """
-            async with session.post(url, json={"query": query}, timeout=10) as response:
-                if response.status != 200:
-                    print(f"API returned status {response.status}, using default prices")
-                    return DEFAULT_PRICES
-                data = await response.json()
-                if 'data' in data and 'tradeprices' in data['data'] and data['data']['tradeprices']['data']:
-                    trade_data = data['data']['tradeprices']['data'][0]
-                    prices = DEFAULT_PRICES.copy()
-                    for resource in DEFAULT_PRICES.keys():
-                        if resource in trade_data and trade_data[resource] is not None:
-                            prices[resource] = float(trade_data[resource])
-                    cache_data = {'timestamp': time.time(), 'prices': prices}
-                    with open(MARKET_PRICES_CACHE_FILE, 'w') as f:
-                        json.dump(cache_data, f)
-                    print("Successfully fetched market prices from GraphQL API")
-                    return prices
-                print("GraphQL API request unsuccessful, using default prices")
+        session = await get_session()
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
+        await pnw_api_limiter.acquire()
+        async with session.post(PNW_API_BASE_URL, json={"query": MARKET_PRICES_QUERY}, headers=headers) as response:
+            if response.status != 200:
+                print(f"API returned status {response.status}, using default prices")
                 return DEFAULT_PRICES
+            data = await read_json_response(response)
+            if 'data' in data and 'tradeprices' in data['data'] and data['data']['tradeprices']['data']:
+                trade_data = data['data']['tradeprices']['data'][0]
+                prices = DEFAULT_PRICES.copy()
+                for resource in DEFAULT_PRICES.keys():
+                    if resource in trade_data and trade_data[resource] is not None:
+                        prices[resource] = float(trade_data[resource])
+                cache_data = {'timestamp': time.time(), 'prices': prices}
+                _prices_cache.update(cache_data)
+                with open(MARKET_PRICES_CACHE_FILE, 'wb') as f:
+                    f.write(orjson.dumps(cache_data))
+                print("Successfully fetched market prices from GraphQL API")
+                return prices
+            print("GraphQL API request unsuccessful, using default prices")
+            return DEFAULT_PRICES
     except Exception as e:
         print(f"Error fetching market prices: {e}")
         return DEFAULT_PRICES
 
 
 
-async def fetch_nation_data(nation_id):
-    """
-    Récupère les données détaillées d'une nation, y compris les villes et projets.
-    
-    Args:
-        nation_id (int): L'ID de la nation
-        
-    Returns:
-        dict: Données détaillées de la nation
-    """
-    query = """
-    query {
-        nations(first: 1, id: [""" + str(nation_id) + """]) {
-            data {
-                id
-                nation_name
-                alliance_id
-                discord
-                num_cities
-                flag
-                color
-                score
-                continent
-                domestic_policy
-                
-                # Resources
-                food
-                uranium
-                oil
-                iron
-                coal
-                bauxite
-                lead
-                aluminum
-                gasoline
-                munitions
-                steel
-                money
-                
-                # Military
-                soldiers
-                tanks
-                aircraft
-                ships
-                spies
-                missiles
-                nukes
-                offensive_wars_count
-                defensive_wars_count
-                
-                # Projects Manufacturing
-                bauxite_works
-                emergency_gasoline_reserve
-                iron_works
-                uranium_enrichment_program
-                specialized_police_training_program
-                international_trade_center
-                telecommunications_satellite
-                clinical_research_center
-                green_technologies
-                arms_stockpile
-                
-                # Projects Others
-                government_support_agency
-                mass_irrigation
-                fallout_shelter
-                bureau_of_domestic_affairs
-                recycling_initiative
-                
-                cities {
-                    date
-                    infrastructure
-                    land
-                    
-                    # Manufacturing
-                    oil_refinery
-                    steel_mill
-                    aluminum_refinery
-                    munitions_factory
-                    
-                    # Mines
-                    uranium_mine
-                    oil_well
-                    iron_mine
-                    coal_mine
-                    bauxite_mine
-                    lead_mine
-                    farm
-                    
-                    # Commerce
-                    subway
-                    stadium
-                    shopping_mall
-                    bank
-                    supermarket
-                    police_station
-                    hospital
-                    recycling_center
-                    
-                    # Power
-                    nuclear_power
-                    coal_power
-                    oil_power
-                    wind_power
-                }
-            }
-        }
+# City fields read by calculate_nation_revenue
+CITY_SELECTION = """
+    cities {
+        date
+        infrastructure
+        land
+
+        # Manufacturing
+        oil_refinery
+        steel_mill
+        aluminum_refinery
+        munitions_factory
+
+        # Mines
+        uranium_mine
+        oil_well
+        iron_mine
+        coal_mine
+        bauxite_mine
+        lead_mine
+        farm
+
+        # Commerce
+        subway
+        stadium
+        shopping_mall
+        bank
+        supermarket
+        police_station
+        hospital
+        recycling_center
+
+        # Power
+        nuclear_power
+        coal_power
+        oil_power
+        wind_power
     }
-    """
-    payload = {"query": query}
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if (data.get("data") and data["data"].get("nations") and 
-                    data["data"]["nations"].get("data") and len(data["data"]["nations"]["data"]) > 0):
-                    return data["data"]["nations"]["data"][0]
-                else:
-                    print(f"Error: Nation data not found - {data}")
-                    return None
-            else:
-                print(f"Error: Failed to fetch nation data - Status {response.status}")
-                return None
+"""
+
+# Nation fields read by calculate_nation_revenue (military, projects and cities)
+NATION_REVENUE_FIELDS = """
+    nation_name
+    num_cities
+    flag
+    color
+    continent
+    domestic_policy
+
+    # Military
+    soldiers
+    tanks
+    aircraft
+    ships
+    spies
+    missiles
+    nukes
+    offensive_wars_count
+    defensive_wars_count
+
+    # Projects Manufacturing
+    bauxite_works
+    emergency_gasoline_reserve
+    iron_works
+    uranium_enrichment_program
+    specialized_police_training_program
+    international_trade_center
+    telecommunications_satellite
+    clinical_research_center
+    green_technologies
+    arms_stockpile
+
+    # Projects Others
+    government_support_agency
+    mass_irrigation
+    fallout_shelter
+    bureau_of_domestic_affairs
+    recycling_initiative
+
+""" + CITY_SELECTION
+
+# Game date and radiation levels used for food production
+GAME_INFO_FIELDS = """
+    game_date
+    radiation {
+        global
+        north_america
+        south_america
+        europe
+        africa
+        asia
+        australia
+        antarctica
+    }
+"""
+
+# Le fichier shelve n'accepte pas d'ouvertures simultanées : un seul thread à la fois
+_nation_cache_lock = threading.Lock()
+
+def load_cached_nation(key):
+    """Retourne les données de nation en cache disque si elles ont moins de NATION_CACHE_TTL secondes."""
+    try:
+        with _nation_cache_lock, shelve.open(NATION_CACHE_FILE) as cache:
+            entry = cache.get(key)
+    except Exception as e:
+        print(f"Nation cache unavailable: {e}")
+        return None
+    if entry and time.time() - entry[0] < NATION_CACHE_TTL:
+        return entry[1]
+    return None
+
+def save_cached_nation(key, nation):
+    """Enregistre les données d'une nation dans le cache disque."""
+    try:
+        with _nation_cache_lock, shelve.open(NATION_CACHE_FILE) as cache:
+            cache[key] = (time.time(), nation)
+    except Exception as e:
+        print(f"Could not write nation cache: {e}")
+
+async def aload_cached_nation(key):
+    """Lit le cache disque des nations dans un thread pour ne pas bloquer la boucle d'événements."""
+    return await asyncio.to_thread(load_cached_nation, key)
+
+async def asave_cached_nation(key, nation):
+    """Écrit dans le cache disque des nations dans un thread pour ne pas bloquer la boucle d'événements."""
+    await asyncio.to_thread(save_cached_nation, key, nation)
+
+# Caches en mémoire pour les données qui ne changent qu'une fois par tour
+_game_info_cache = {"value": None, "expires": 0}
+_color_data_cache = {"value": None, "expires": 0}
+# Données fiscales traitées, une entrée par (alliance_id, days), et le verrou de chaque calcul
+_tax_data_cache = {}
+_tax_data_locks = {}
+
+def _get_cached(cache):
+    """Retourne la valeur en cache si elle n'a pas expiré, sinon None."""
+    if cache["value"] is not None and time.monotonic() < cache["expires"]:
+        return cache["value"]
+    return None
+
+def _set_cached(cache, value, ttl):
+    """Enregistre une valeur dans un cache en mémoire pour ttl secondes."""
+    cache["value"] = value
+    cache["expires"] = time.monotonic() + ttl
+
+GAME_INFO_QUERY = """
+query {
+    game_info {""" + GAME_INFO_FIELDS + """
+    }
+}
+"""
+
+COLORS_QUERY = """
+query {
+    colors {
+        color
+        turn_bonus
+    }
+}
+"""
 
 async def fetch_game_info():
     """
@@ -312,38 +468,27 @@ async def fetch_game_info():
     Returns:
         dict: Informations de jeu
     """
-    query = """
-    query {
-        game_info {
-            game_date
-            radiation {
-                global
-                north_america
-                south_america
-                europe
-                africa
-                asia
-                australia
-                antarctica
-            }
-        }
-    }
-    """
-    payload = {"query": query}
+    cached = _get_cached(_game_info_cache)
+    if cached:
+        return cached
+    
+    payload = {"query": GAME_INFO_QUERY}
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data.get("data") and data["data"].get("game_info"):
-                    return data["data"]["game_info"]
-                else:
-                    print(f"Error: Game info not found - {data}")
-                    return None
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
+        if response.status == 200:
+            data = await read_json_response(response)
+            if data.get("data") and data["data"].get("game_info"):
+                _set_cached(_game_info_cache, data["data"]["game_info"], GAME_INFO_TTL)
+                return data["data"]["game_info"]
             else:
-                print(f"Error: Failed to fetch game info - Status {response.status}")
+                print(f"Error: Game info not found - {data}")
                 return None
+        else:
+            print(f"Error: Failed to fetch game info - Status {response.status}")
+            return None
 
 async def fetch_color_data():
     """
@@ -352,98 +497,238 @@ async def fetch_color_data():
     Returns:
         dict: Dictionnaire des bonus de couleur
     """
-    query = """
-    query {
-        colors {
-            color
-            turn_bonus
+    cached = _get_cached(_color_data_cache)
+    if cached:
+        return cached
+    
+    payload = {"query": COLORS_QUERY}
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
+    
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
+        if response.status == 200:
+            data = await read_json_response(response)
+            if data.get("data") and data["data"].get("colors"):
+                colors = data["data"]["colors"]
+                color_bonuses = {color["color"]: color["turn_bonus"] for color in colors}
+                _set_cached(_color_data_cache, color_bonuses, COLOR_DATA_TTL)
+                return color_bonuses
+            else:
+                print(f"Error: Color data not found - {data}")
+                return {}
+        else:
+            print(f"Error: Failed to fetch color data - Status {response.status}")
+            return {}
+
+REVENUE_BUNDLE_QUERY = """
+query($id: [Int], $withNation: Boolean!, $withAlliance: Boolean!, $withGameInfo: Boolean!, $withColors: Boolean!) {
+    nation: nations(first: 1, id: $id) @include(if: $withNation) {
+        data {""" + NATION_REVENUE_FIELDS + """
+            alliance @include(if: $withAlliance) {
+                color
+            }
         }
     }
+    game_info @include(if: $withGameInfo) {""" + GAME_INFO_FIELDS + """
+    }
+    colors @include(if: $withColors) {
+        color
+        turn_bonus
+    }
+}
+"""
+
+async def fetch_revenue_bundle(nation_id, with_alliance=True):
     """
-    payload = {"query": query}
+    Récupère en une seule requête GraphQL tout ce dont calculate_nation_revenue a besoin :
+    la nation (avec la couleur de son alliance), les informations de jeu et les bonus de couleur.
+    
+    Args:
+        nation_id (int): L'ID de la nation
+        with_alliance (bool): Inclure la couleur de l'alliance (inutile si l'appelant la connaît déjà)
+        
+    Returns:
+        dict: {"nation": ..., "game_info": ..., "color_bonuses": ...} ou None en cas d'échec
+    """
+    # Chaque partie n'est demandée que si son cache a expiré
+    cache_key = f"revenue:{nation_id}"
+    nation = await aload_cached_nation(cache_key)
+    if nation and with_alliance and "alliance" not in nation:
+        nation = None  # Entrée en cache sans la couleur de l'alliance
+    game_info = _get_cached(_game_info_cache)
+    color_bonuses = _get_cached(_color_data_cache)
+    if nation and game_info and color_bonuses:
+        return {"nation": nation, "game_info": game_info, "color_bonuses": color_bonuses}
+    
+    payload = {
+        "query": REVENUE_BUNDLE_QUERY,
+        "variables": {
+            "id": [int(nation_id)],
+            "withNation": not nation,
+            "withAlliance": with_alliance,
+            "withGameInfo": not game_info,
+            "withColors": not color_bonuses
+        }
+    }
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data.get("data") and data["data"].get("colors"):
-                    colors = data["data"]["colors"]
-                    return {color["color"]: color["turn_bonus"] for color in colors}
-                else:
-                    print(f"Error: Color data not found - {data}")
-                    return {}
-            else:
-                print(f"Error: Failed to fetch color data - Status {response.status}")
-                return {}
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
+        if response.status == 200:
+            data = await read_json_response(response)
+            if not data.get("data"):
+                print(f"Error: Revenue data not found - {data}")
+                return None
+            data = data["data"]
+            
+            if not nation:
+                nations = (data.get("nation") or {}).get("data") or []
+                nation = nations[0] if nations else None
+                if nation:
+                    await asave_cached_nation(cache_key, nation)
+            if not game_info and data.get("game_info"):
+                game_info = data["game_info"]
+                _set_cached(_game_info_cache, game_info, GAME_INFO_TTL)
+            if not color_bonuses and data.get("colors"):
+                color_bonuses = {color["color"]: color["turn_bonus"] for color in data["colors"]}
+                _set_cached(_color_data_cache, color_bonuses, COLOR_DATA_TTL)
+            
+            return {
+                "nation": nation,
+                "game_info": game_info,
+                "color_bonuses": color_bonuses or {}
+            }
+        else:
+            print(f"Error: Failed to fetch revenue data - Status {response.status}")
+            return None
+
+# Ressources produites, dans l'ordre des colonnes des agrégations NumPy
+REVENUE_RESOURCES = ("food", "uranium", "oil", "iron", "coal", "bauxite", "lead", "aluminum", "gasoline", "munitions", "steel")
+REVENUE_INCOME_KEYS = (
+    "gross_income", "color_bonus", "gross_total", "military_upkeep",
+    "improvement_upkeep", "gross_upkeep", "net_income", "monetary_net_income"
+)
+
+# Tuples nommés dans l'ordre des colonnes : une ligne d'agrégation sans construire de dictionnaire
+NationProduction = namedtuple("NationProduction", REVENUE_RESOURCES)
+NationIncome = namedtuple("NationIncome", REVENUE_INCOME_KEYS)
+
+# Colonnes de bâtiments des villes, dans l'ordre des colonnes de la matrice de calcul des revenus
+CITY_BUILDINGS = (
+    "oil_refinery", "steel_mill", "aluminum_refinery", "munitions_factory",
+    "uranium_mine", "oil_well", "iron_mine", "coal_mine", "bauxite_mine", "lead_mine", "farm",
+    "subway", "stadium", "shopping_mall", "bank", "supermarket", "police_station", "hospital", "recycling_center",
+    "nuclear_power", "coal_power", "oil_power", "wind_power"
+)
 
-async def calculate_nation_revenue(nation_id):
+# Extraction des champs d'une ville dans l'ordre des colonnes de la matrice (infrastructure, terrain, bâtiments)
+_city_numeric_fields = operator.itemgetter("infrastructure", "land", *CITY_BUILDINGS)
+_city_date_field = operator.itemgetter("date")
+
+# Courbes de bonus de spécialisation, indexées par le nombre de bâtiments de la ville (0 à 20)
+_SPEC5 = 1 + (0.5 * (np.arange(21) - 1)) / (5 - 1)
+_SPEC20 = 1 + (0.5 * (np.arange(21) - 1)) / (20 - 1)
+
+def _specialization_bonus(counts, curve):
+    """Look up the specialization bonus for each city's building count."""
+    return np.take(curve, counts.astype(np.intp), mode='clip')
+
+@functools.lru_cache(maxsize=4096)
+def _parse_city_date(date_str):
+    """Parse a city founding date returned by the API (ISO 8601, optional trailing Z)."""
+    return datetime.fromisoformat(date_str[:-1] + '+00:00' if date_str.endswith('Z') else date_str)
+
+@functools.lru_cache(maxsize=4096)
+def _city_age(date_str, today_ordinal):
+    """Return the log of a city's age in days (at least one day) as of the given ordinal date."""
+    age_days = max(1, (datetime.fromordinal(today_ordinal) - _parse_city_date(date_str)).days)
+    return math.log(age_days)
+
+async def calculate_nation_revenue(nation_id, alliance_color=None):
     """
     Calcule le revenu journalier d'une nation.
     
     Args:
         nation_id (int): L'ID de la nation
+        alliance_color (str): Couleur de l'alliance si déjà connue (évite de la redemander pour chaque membre)
         
     Returns:
         dict: Détails du revenu journalier
     """
-    # Récupérer les données nécessaires
-    nation = await fetch_nation_data(nation_id)
-    if not nation:
+    # Récupérer en parallèle la nation (avec infos de jeu et bonus de couleur) et les prix du marché
+    bundle, market_prices = await asyncio.gather(
+        fetch_revenue_bundle(nation_id, with_alliance=alliance_color is None),
+        get_pnw_market_prices()
+    )
+    if not bundle or not bundle["nation"]:
         return {"error": "Nation non trouvée"}
+    nation = bundle["nation"]
     
-    game_info = await fetch_game_info()
+    game_info = bundle["game_info"]
     if not game_info:
         return {"error": "Impossible de récupérer les informations du jeu"}
     
-    color_bonuses = await fetch_color_data()
-    
-    # Récupérer les prix du marché (fonction déjà existante)
-    market_prices = await get_pnw_market_prices()
+    return compute_nation_revenue(nation, game_info, bundle["color_bonuses"], revenue_prices(market_prices), alliance_color)
+
+def revenue_prices(market_prices):
+    """Convertit une fois les prix du marché en floats pour chaque ressource de REVENUE_RESOURCES."""
+    return {resource: float(market_prices.get(resource, 0)) for resource in REVENUE_RESOURCES}
+
+def compute_nation_revenue(nation, game_info, color_bonuses, prices, alliance_color=None):
+    """
+    Calcule le revenu journalier d'une nation à partir de données déjà récupérées (aucun appel réseau).
     
-    # Récupérer la couleur de l'alliance si la nation est dans une alliance
-    alliance_color = None
-    if nation.get("alliance_id"):
-        alliance_query = """
-        query {
-            alliances(first: 1, id: [""" + str(nation["alliance_id"]) + """]) {
-                data {
-                    color
-                }
-            }
-        }
-        """
-        payload = {"query": alliance_query}
-        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
+    Args:
+        nation (dict): Données de la nation (champs NATION_REVENUE_FIELDS)
+        game_info (dict): Informations de jeu (date, radiation)
+        color_bonuses (dict): Bonus de tour par couleur
+        prices (dict): Prix du marché par ressource, tels que retournés par revenue_prices
+        alliance_color (str): Couleur de l'alliance, sinon lue dans nation["alliance"]
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if (data.get("data") and data["data"].get("alliances") and 
-                        data["data"]["alliances"].get("data") and len(data["data"]["alliances"]["data"]) > 0):
-                        alliance_color = data["data"]["alliances"]["data"][0]["color"]
-    
-    # Initialiser les variables pour les calculs
-    production = {
-        "food": 0,
-        "uranium": 0,
-        "oil": 0,
-        "iron": 0,
-        "coal": 0,
-        "bauxite": 0,
-        "lead": 0,
-        "aluminum": 0, 
-        "gasoline": 0,
-        "munitions": 0,
-        "steel": 0
+    Returns:
+        dict: Détails du revenu journalier
+    """
+    production, income, total_monetary_value = nation_revenue_rows(nation, game_info, color_bonuses, prices, alliance_color)
+    
+    monetary_resources = {
+        resource: {"amount": amount, "value": amount * prices[resource]}
+        for resource, amount in zip(REVENUE_RESOURCES, production)
     }
     
-    income = {
-        "gross_income": 0,
-        "military_upkeep": 0,
-        "improvement_upkeep": 0
+    # Résultat
+    return {
+        "nation_name": nation["nation_name"],
+        "flag": nation["flag"],
+        "num_cities": nation["num_cities"],
+        "production": production._asdict(),
+        "monetary_resources": monetary_resources,
+        "total_monetary_value": total_monetary_value,
+        "income": income._asdict()
     }
+
+def nation_revenue_rows(nation, game_info, color_bonuses, prices, alliance_color=None):
+    """
+    Calcule la production et le revenu journaliers d'une nation sous forme de tuples nommés.
+    
+    Args:
+        nation (dict): Données de la nation (champs NATION_REVENUE_FIELDS)
+        game_info (dict): Informations de jeu (date, radiation)
+        color_bonuses (dict): Bonus de tour par couleur
+        prices (dict): Prix du marché par ressource, tels que retournés par revenue_prices
+        alliance_color (str): Couleur de l'alliance, sinon lue dans nation["alliance"]
+        
+    Returns:
+        tuple: (NationProduction, NationIncome, valeur monétaire totale de la production)
+    """
+    # Couleur de l'alliance si la nation est dans une alliance
+    if alliance_color is None:
+        alliance_color = nation["alliance"]["color"] if nation.get("alliance") else None
+    
+    # Initialiser les accumulateurs (variables locales, regroupées en tuples nommés à la fin)
+    food = uranium = oil = iron = coal = bauxite = lead = aluminum = gasoline = munitions = steel = 0.0
+    city_gross_income = military_upkeep = improvement_upkeep = 0.0
     
     # Date actuelle
     today = datetime.now()
@@ -461,273 +746,294 @@ async def calculate_nation_revenue(nation_id):
     }
     continent_radiation = radiation.get(nation["continent"], 0)
     
-    # Calculer la production et les revenus pour chaque ville
-    for city in nation["cities"]:
-        # Calcul de l'âge de la ville
-        city_date = datetime.fromisoformat(city["date"].replace('Z', '+00:00'))
-        age_days = max(1, (truncated_date - city_date).days)
-        ln_age = math.log(age_days)
-        city_age_modifier = 1 + max(ln_age / 15, 0)
-        
-        # Population de base
-        base_population = city["infrastructure"] * 100
-        
-        # Consommation de nourriture par la population
-        population_formula = ((base_population * base_population) / 125000000) + ((base_population * city_age_modifier - base_population) / 850)
-        production["food"] -= population_formula
-        
-        # ----- PRODUCTION DE NOURRITURE -----
-        # Bonus de spécialisation des améliorations
-        improvement_specialization_bonus = 1 + ((0.5 * (city["farm"] - 1)) / (20 - 1))
-        
-        # Taux de production alimentaire (modifié par projet)
-        if nation["mass_irrigation"]:
-            food_production_rate = city["land"] / 400
-        else:
-            food_production_rate = city["land"] / 500
-        
-        # Modificateur de continent pour l'Antarctique
-        if nation["continent"] == 'an':
-            food_production_rate *= 0.5
-        
-        # Production alimentaire de base
-        base_food_production = round(city["farm"] * improvement_specialization_bonus * food_production_rate * 100) / 100
-        
-        # Modificateur saisonnier
-        hemisphere = 'Southern' if nation["continent"] in ['sa', 'as', 'af'] else 'Northern'
-        seasonal_modifier = 1
-        
-        # Obtenir le mois de la date du jeu
-        game_date = datetime.fromisoformat(game_info["game_date"].replace('Z', '+00:00'))
-        game_date_month = game_date.month
-        
-        # Appliquer le modificateur saisonnier (sauf en Antarctique)
-        if nation["continent"] != 'an':
-            if hemisphere == 'Northern':
-                if game_date_month in [12, 1, 2]:  # Hiver dans l'hémisphère nord
-                    seasonal_modifier = 0.8
-                elif game_date_month in [6, 7, 8]:  # Été dans l'hémisphère nord
-                    seasonal_modifier = 1.2
-            else:  # Hémisphère sud
-                if game_date_month in [12, 1, 2]:  # Été dans l'hémisphère sud
-                    seasonal_modifier = 1.2
-                elif game_date_month in [6, 7, 8]:  # Hiver dans l'hémisphère sud
-                    seasonal_modifier = 0.8
-        
-        # Pénalité de radiation
-        radiation_index = float(continent_radiation) + float(game_info["radiation"]["global"])
-        fallout_shelter_multiplier = 0.85 if nation["fallout_shelter"] else 1
-        radiation_penalty = (radiation_index / (-1000)) * fallout_shelter_multiplier
-        
-        # Production alimentaire finale
-        food_production = max(base_food_production * seasonal_modifier * (1 + radiation_penalty), 0)
-        production["food"] += food_production * 12  # Multiplie par 12 pour obtenir la valeur journalière
-        
-        # ----- CONSOMMATION DES CENTRALES ÉLECTRIQUES -----
-        # Centrale nucléaire
-        current_infrastructure = (city["infrastructure"] + 999) // 1000  # Math.ceil(infrastructure / 1000)
-        infrastructure_can_power = city["nuclear_power"] * 2000 // 1000
-        smallest_two = min(current_infrastructure, infrastructure_can_power)
-        production["uranium"] -= smallest_two * 2.4
-        
-        # Centrale à charbon
-        current_infrastructure = (city["infrastructure"] + 99) // 100  # Math.ceil(infrastructure / 100)
-        infrastructure_can_power = city["coal_power"] * 500 // 100
-        smallest_two = min(current_infrastructure, infrastructure_can_power)
-        production["coal"] -= smallest_two * 1.2
-        
-        # Centrale à pétrole
-        infrastructure_can_power = city["oil_power"] * 500 // 100
-        smallest_two = min(current_infrastructure, infrastructure_can_power)
-        production["oil"] -= smallest_two * 1.2
-        
-        # ----- MULTIPLICATEURS DE PROJETS -----
-        multipliers = {
-            "oil": 1,
-            "steel": 1,
-            "uranium": 1,
-            "aluminum": 1,
-            "munitions": 1
-        }
-        
-        commerce = 0
-        commerce_cap = 100
-        commerce_addition = 0
-        
-        # Appliquer les bonus de projets sur les productions
-        if nation["bauxite_works"]:
-            multipliers["aluminum"] = 1.36
-        if nation["emergency_gasoline_reserve"]:
-            multipliers["oil"] = 2
-        if nation["iron_works"]:
-            multipliers["steel"] = 1.36
-        if nation["arms_stockpile"]:
-            multipliers["munitions"] = 1.20
-        if nation["uranium_enrichment_program"]:
-            multipliers["uranium"] = 2
-        
-        # ----- CONSOMMATION DES USINES -----
-        # Raffinerie de pétrole
-        production["oil"] -= (3 * city["oil_refinery"]) * (1 + (0.5 * (city["oil_refinery"] - 1)) / (5 - 1)) * multipliers["oil"]
-        
-        # Aciérie
-        production["iron"] -= (3 * city["steel_mill"]) * (1 + (0.5 * (city["steel_mill"] - 1)) / (5 - 1)) * multipliers["steel"]
-        production["coal"] -= (3 * city["steel_mill"]) * (1 + (0.5 * (city["steel_mill"] - 1)) / (5 - 1)) * multipliers["steel"]
-        
-        # Raffinerie d'aluminium
-        production["bauxite"] -= (3 * city["aluminum_refinery"]) * (1 + (0.5 * (city["aluminum_refinery"] - 1)) / (5 - 1)) * multipliers["aluminum"]
-        
-        # Usine de munitions
-        production["lead"] -= (6 * city["munitions_factory"]) * (1 + (0.5 * (city["munitions_factory"] - 1)) / (5 - 1))
-        
-        # ----- PRODUCTION DES USINES -----
-        # Raffinerie de pétrole produit de l'essence
-        production["gasoline"] += (6 * city["oil_refinery"]) * (1 + (0.5 * (city["oil_refinery"] - 1)) / (5 - 1)) * multipliers["oil"]
-        
-        # Aciérie produit de l'acier
-        production["steel"] += (9 * city["steel_mill"]) * (1 + (0.5 * (city["steel_mill"] - 1)) / (5 - 1)) * multipliers["steel"]
-        
-        # Raffinerie d'aluminium produit de l'aluminium
-        production["aluminum"] += (9 * city["aluminum_refinery"]) * (1 + (0.5 * (city["aluminum_refinery"] - 1)) / (5 - 1)) * multipliers["aluminum"]
-        
-        # Usine de munitions produit des munitions
-        production["munitions"] += (18 * city["munitions_factory"]) * (1 + (0.5 * (city["munitions_factory"] - 1)) / (5 - 1)) * multipliers["munitions"]
-        
-        # ----- PRODUCTION DES MINES -----
-        # Mine d'uranium
-        production["uranium"] += (city["uranium_mine"] * 3) * (1 + (0.5 * (city["uranium_mine"] - 1)) / (5 - 1)) * multipliers["uranium"]
-        
-        # Puits de pétrole
-        production["oil"] += (city["oil_well"] * 3) * (1 + (0.5 * (city["oil_well"] - 1)) / (5 - 1))
-        
-        # Mine de fer
-        production["iron"] += (city["iron_mine"] * 3) * (1 + (0.5 * (city["iron_mine"] - 1)) / (5 - 1))
-        
-        # Mine de charbon
-        production["coal"] += (city["coal_mine"] * 3) * (1 + (0.5 * (city["coal_mine"] - 1)) / (5 - 1))
-        
-        # Mine de bauxite
-        production["bauxite"] += (city["bauxite_mine"] * 3) * (1 + (0.5 * (city["bauxite_mine"] - 1)) / (5 - 1))
-        
-        # Mine de plomb
-        production["lead"] += (city["lead_mine"] * 3) * (1 + (0.5 * (city["lead_mine"] - 1)) / (5 - 1))
-        
-        # ----- COMMERCE ET PROJETS -----
-        # Projets affectant le commerce
-        if nation["international_trade_center"]:
-            if nation["telecommunications_satellite"]:
-                commerce_cap = 125
-            else:
-                commerce_cap = 115
-        
-        if nation["international_trade_center"]:
-            commerce_addition += 1
-        if nation["specialized_police_training_program"]:
-            commerce_addition += 4
-        if nation["telecommunications_satellite"]:
-            commerce_addition += 2
-        
-        # Densité de population
-        population_density = base_population / city["land"] if city["land"] > 0 else 0
-        
-        # Calcul du commerce
-        commerce += min(
-            city["supermarket"]*4 + city["bank"]*6 + city["shopping_mall"]*8 + 
-            city["stadium"]*10 + city["subway"]*8 + commerce_addition, 
-            commerce_cap
-        )
-        
-        # ----- MODIFICATEURS DE POLICE ET D'HÔPITAL -----
-        police_modifier_modifier = 3.5 if nation["specialized_police_training_program"] else 2.5
-        hospital_modifier_modifier = 3.5 if nation["clinical_research_center"] else 2.5
-        
-        # ----- MODIFICATEURS ENVIRONNEMENTAUX -----
-        # Green Technologies
-        farm_greentech_multiplier = 0.5 if nation["green_technologies"] else 1
-        manu_greentech_multiplier = 0.75 if nation["green_technologies"] else 1
-        subway_greentech_addition = 25 if nation["green_technologies"] else 0
-        resource_production_upkeep_multiplier = 0.9 if nation["green_technologies"] else 1
-        
-        # ----- COÛTS D'ENTRETIEN DES INFRASTRUCTURES -----
-        income["improvement_upkeep"] += (
-            (city["coal_power"] * 1200) + 
-            (city["oil_power"] * 1800) + 
-            (city["nuclear_power"] * 10500) + 
-            (city["wind_power"] * 500) + 
-            (city["coal_mine"] * 400 * resource_production_upkeep_multiplier) + 
-            (city["iron_mine"] * 1600 * resource_production_upkeep_multiplier) + 
-            (city["lead_mine"] * 1500 * resource_production_upkeep_multiplier) + 
-            (city["farm"] * 300 * resource_production_upkeep_multiplier) + 
-            (city["oil_well"] * 600 * resource_production_upkeep_multiplier) + 
-            (city["bauxite_mine"] * 1600 * resource_production_upkeep_multiplier) + 
-            (city["uranium_mine"] * 5000 * resource_production_upkeep_multiplier) + 
-            (city["oil_refinery"] * 4000 * resource_production_upkeep_multiplier) + 
-            (city["steel_mill"] * 4000 * resource_production_upkeep_multiplier) + 
-            (city["aluminum_refinery"] * 2500 * resource_production_upkeep_multiplier) + 
-            (city["munitions_factory"] * 3500 * resource_production_upkeep_multiplier) + 
-            (city["police_station"] * 750) + 
-            (city["hospital"] * 1000) + 
-            (city["recycling_center"] * 2500) + 
-            (city["subway"] * 3250) + 
-            (city["supermarket"] * 600) + 
-            (city["bank"] * 1800) + 
-            (city["shopping_mall"] * 5400) + 
-            (city["stadium"] * 12150)
-        )
-        
-        # ----- CALCUL DE LA POLLUTION -----
-        pollution_index = (
-            (city["coal_power"] * 8) + 
-            (city["oil_power"] * 6) + 
-            (city["bauxite_mine"] * 12) + 
-            (city["coal_mine"] * 12) + 
-            (city["farm"] * 2 * farm_greentech_multiplier) + 
-            (city["iron_mine"] * 12) + 
-            (city["lead_mine"] * 12) + 
-            (city["oil_well"] * 12) + 
-            (city["uranium_mine"] * 20) + 
-            (city["oil_refinery"] * 32 * manu_greentech_multiplier) + 
-            (city["steel_mill"] * 40 * manu_greentech_multiplier) + 
-            (city["aluminum_refinery"] * 40 * manu_greentech_multiplier) + 
-            (city["munitions_factory"] * 32 * manu_greentech_multiplier) + 
-            (city["police_station"] * 1) + 
-            (city["hospital"] * 4) - 
-            (city["recycling_center"] * (75 if nation["recycling_initiative"] else 70)) - 
-            (city["subway"] * (45 + subway_greentech_addition)) + 
-            (city["shopping_mall"] * 2) + 
-            (city["stadium"] * 5)
-        )
-        
-        # Calcul des modificateurs finaux
-        police_modifier = city["police_station"] * police_modifier_modifier
-        pollution_modifier = pollution_index * 0.05
-        hospital_modifier = city["hospital"] * hospital_modifier_modifier
-        
-        # ----- TAUX DE CRIMINALITÉ ET DE MALADIE -----
-        crime_rate = (((103 - commerce)*(103 - commerce)) + (city["infrastructure"] * 100))/(111111) - police_modifier
-        disease_rate = ((((population_density*population_density) * 0.01) - 25)/100) + (base_population/100000) + pollution_modifier - hospital_modifier
-        
-        # ----- POPULATION FINALE -----
-        population = base_population - (max(((disease_rate * 100 * city["infrastructure"])/100), 0)) - (max((crime_rate / 10) * (100*city["infrastructure"]) - 25, 0))
-        population = population * (1 + ln_age/15)
-        
-        # ----- CALCUL DU REVENU -----
-        income["gross_income"] += ((((commerce / 50) * 0.725) + 0.725) * population)
+    # ----- CONSTANTES AU NIVEAU DE LA NATION -----
+    # Ces valeurs ne dépendent pas de la ville : on les calcule une seule fois avant la boucle
+    
+    # Modificateur saisonnier
+    hemisphere = 'Southern' if nation["continent"] in ['sa', 'as', 'af'] else 'Northern'
+    seasonal_modifier = 1
+    
+    # Obtenir le mois de la date du jeu
+    game_date = datetime.fromisoformat(game_info["game_date"].replace('Z', '+00:00'))
+    game_date_month = game_date.month
+    
+    # Appliquer le modificateur saisonnier (sauf en Antarctique)
+    if nation["continent"] != 'an':
+        if hemisphere == 'Northern':
+            if game_date_month in [12, 1, 2]:  # Hiver dans l'hémisphère nord
+                seasonal_modifier = 0.8
+            elif game_date_month in [6, 7, 8]:  # Été dans l'hémisphère nord
+                seasonal_modifier = 1.2
+        else:  # Hémisphère sud
+            if game_date_month in [12, 1, 2]:  # Été dans l'hémisphère sud
+                seasonal_modifier = 1.2
+            elif game_date_month in [6, 7, 8]:  # Hiver dans l'hémisphère sud
+                seasonal_modifier = 0.8
+    
+    # Pénalité de radiation
+    radiation_index = float(continent_radiation) + float(game_info["radiation"]["global"])
+    fallout_shelter_multiplier = 0.85 if nation["fallout_shelter"] else 1
+    radiation_penalty = (radiation_index / (-1000)) * fallout_shelter_multiplier
+    
+    # Multiplicateurs de projets
+    multipliers = {
+        "oil": 1,
+        "steel": 1,
+        "uranium": 1,
+        "aluminum": 1,
+        "munitions": 1
+    }
+    
+    # Appliquer les bonus de projets sur les productions
+    if nation["bauxite_works"]:
+        multipliers["aluminum"] = 1.36
+    if nation["emergency_gasoline_reserve"]:
+        multipliers["oil"] = 2
+    if nation["iron_works"]:
+        multipliers["steel"] = 1.36
+    if nation["arms_stockpile"]:
+        multipliers["munitions"] = 1.20
+    if nation["uranium_enrichment_program"]:
+        multipliers["uranium"] = 2
+    
+    multiplier_oil = multipliers["oil"]
+    multiplier_steel = multipliers["steel"]
+    multiplier_uranium = multipliers["uranium"]
+    multiplier_aluminum = multipliers["aluminum"]
+    multiplier_munitions = multipliers["munitions"]
+    
+    # Projets affectant le commerce
+    commerce_cap = 100
+    commerce_addition = 0
+    
+    if nation["international_trade_center"]:
+        commerce_cap = 125 if nation["telecommunications_satellite"] else 115
+        commerce_addition += 1
+    if nation["specialized_police_training_program"]:
+        commerce_addition += 4
+    if nation["telecommunications_satellite"]:
+        commerce_addition += 2
+    
+    # Modificateurs de police et d'hôpital
+    police_modifier_modifier = 3.5 if nation["specialized_police_training_program"] else 2.5
+    hospital_modifier_modifier = 3.5 if nation["clinical_research_center"] else 2.5
+    
+    # Green Technologies
+    farm_greentech_multiplier = 0.5 if nation["green_technologies"] else 1
+    manu_greentech_multiplier = 0.75 if nation["green_technologies"] else 1
+    subway_greentech_addition = 25 if nation["green_technologies"] else 0
+    resource_production_upkeep_multiplier = 0.9 if nation["green_technologies"] else 1
+    
+    # Production alimentaire par unité de terrain (Mass Irrigation, Antarctique)
+    food_rate_per_land = 1 / 400 if nation["mass_irrigation"] else 1 / 500
+    if nation["continent"] == 'an':
+        food_rate_per_land *= 0.5
+    
+    # Réduction de pollution des centres de recyclage
+    recycling_pollution_reduction = 75 if nation["recycling_initiative"] else 70
+    
+    # Calculer la production et les revenus de toutes les villes en une fois (une colonne par bâtiment)
+    # Le schéma des villes est fixe : une seule extraction par ville vers une matrice numérique
+    cities = nation["cities"]
+    # reshape : une nation sans villes donne une matrice 0 x colonnes au lieu d'un tableau 1D vide
+    city_matrix = np.array([_city_numeric_fields(city) for city in cities], dtype=np.float64).reshape(-1, 2 + len(CITY_BUILDINGS))
+    infra = city_matrix[:, 0]
+    land = city_matrix[:, 1]
+    
+    # Matrice villes x bâtiments ; chaque colonne est une vue sur cette matrice
+    buildings = city_matrix[:, 2:]
+    (oil_refinery, steel_mill, aluminum_refinery, munitions_factory,
+     uranium_mine, oil_well, iron_mine, coal_mine, bauxite_mine, lead_mine, farm,
+     subway, stadium, shopping_mall, bank, supermarket, police_station, hospital, recycling_center,
+     nuclear_power, coal_power, oil_power, wind_power) = buildings.T
+    
+    # Calcul de l'âge des villes
+    today_ordinal = truncated_date.toordinal()
+    ln_age = np.array([_city_age(date, today_ordinal) for date in map(_city_date_field, cities)], dtype=np.float64)
+    city_age_modifier = 1 + np.maximum(ln_age / 15, 0)
+    
+    # Population de base
+    base_population = infra * 100
+    
+    # Consommation de nourriture par la population
+    population_formula = ((base_population * base_population) / 125000000) + ((base_population * city_age_modifier - base_population) / 850)
+    food -= population_formula.sum()
+    
+    # ----- PRODUCTION DE NOURRITURE -----
+    # Bonus de spécialisation des améliorations
+    improvement_specialization_bonus = _specialization_bonus(farm, _SPEC20)
+    
+    # Taux de production alimentaire (modifié par projet et par continent)
+    food_production_rate = land * food_rate_per_land
+    
+    # Production alimentaire de base
+    base_food_production = np.round(farm * improvement_specialization_bonus * food_production_rate * 100) / 100
+    
+    # Production alimentaire finale
+    food_production = np.maximum(base_food_production * seasonal_modifier * (1 + radiation_penalty), 0)
+    food += food_production.sum() * 12  # Multiplie par 12 pour obtenir la valeur journalière
+    
+    # ----- CONSOMMATION DES CENTRALES ÉLECTRIQUES -----
+    # Infrastructure arrondie au millier et à la centaine supérieurs (Math.ceil)
+    infra_ceil1000 = -(-infra // 1000)
+    infra_ceil100 = -(-infra // 100)
+    
+    # Centrale nucléaire : 2000 d'infrastructure par centrale
+    uranium -= np.minimum(infra_ceil1000, nuclear_power * 2).sum() * 2.4
+    
+    # Centrale à charbon : 500 d'infrastructure par centrale
+    coal -= np.minimum(infra_ceil100, coal_power * 5).sum() * 1.2
+    
+    # Centrale à pétrole : 500 d'infrastructure par centrale
+    oil -= np.minimum(infra_ceil100, oil_power * 5).sum() * 1.2
+    
+    # Bonus de spécialisation des usines et des mines
+    oil_refinery_bonus = _specialization_bonus(oil_refinery, _SPEC5)
+    steel_mill_bonus = _specialization_bonus(steel_mill, _SPEC5)
+    aluminum_refinery_bonus = _specialization_bonus(aluminum_refinery, _SPEC5)
+    munitions_factory_bonus = _specialization_bonus(munitions_factory, _SPEC5)
+    
+    # ----- CONSOMMATION DES USINES -----
+    # Raffinerie de pétrole
+    oil -= ((3 * oil_refinery) * oil_refinery_bonus).sum() * multiplier_oil
+    
+    # Aciérie
+    iron -= ((3 * steel_mill) * steel_mill_bonus).sum() * multiplier_steel
+    coal -= ((3 * steel_mill) * steel_mill_bonus).sum() * multiplier_steel
+    
+    # Raffinerie d'aluminium
+    bauxite -= ((3 * aluminum_refinery) * aluminum_refinery_bonus).sum() * multiplier_aluminum
+    
+    # Usine de munitions
+    lead -= ((6 * munitions_factory) * munitions_factory_bonus).sum()
+    
+    # ----- PRODUCTION DES USINES -----
+    # Raffinerie de pétrole produit de l'essence
+    gasoline += ((6 * oil_refinery) * oil_refinery_bonus).sum() * multiplier_oil
+    
+    # Aciérie produit de l'acier
+    steel += ((9 * steel_mill) * steel_mill_bonus).sum() * multiplier_steel
+    
+    # Raffinerie d'aluminium produit de l'aluminium
+    aluminum += ((9 * aluminum_refinery) * aluminum_refinery_bonus).sum() * multiplier_aluminum
+    
+    # Usine de munitions produit des munitions
+    munitions += ((18 * munitions_factory) * munitions_factory_bonus).sum() * multiplier_munitions
+    
+    # ----- PRODUCTION DES MINES -----
+    # Mine d'uranium
+    uranium += ((uranium_mine * 3) * _specialization_bonus(uranium_mine, _SPEC5)).sum() * multiplier_uranium
+    
+    # Puits de pétrole
+    oil += ((oil_well * 3) * _specialization_bonus(oil_well, _SPEC5)).sum()
+    
+    # Mine de fer
+    iron += ((iron_mine * 3) * _specialization_bonus(iron_mine, _SPEC5)).sum()
+    
+    # Mine de charbon
+    coal += ((coal_mine * 3) * _specialization_bonus(coal_mine, _SPEC5)).sum()
+    
+    # Mine de bauxite
+    bauxite += ((bauxite_mine * 3) * _specialization_bonus(bauxite_mine, _SPEC5)).sum()
+    
+    # Mine de plomb
+    lead += ((lead_mine * 3) * _specialization_bonus(lead_mine, _SPEC5)).sum()
+    
+    # ----- COMMERCE -----
+    # Densité de population
+    population_density = np.divide(base_population, land, out=np.zeros_like(base_population), where=land > 0)
+    
+    # Calcul du commerce
+    commerce = np.minimum(
+        supermarket*4 + bank*6 + shopping_mall*8 + 
+        stadium*10 + subway*8 + commerce_addition, 
+        commerce_cap
+    )
+    
+    # ----- COÛTS D'ENTRETIEN DES INFRASTRUCTURES ET POLLUTION -----
+    # Les deux sont des combinaisons linéaires des mêmes colonnes : un produit matriciel chacun
+    upkeep_costs = {
+        "coal_power": 1200,
+        "oil_power": 1800,
+        "nuclear_power": 10500,
+        "wind_power": 500,
+        "coal_mine": 400 * resource_production_upkeep_multiplier,
+        "iron_mine": 1600 * resource_production_upkeep_multiplier,
+        "lead_mine": 1500 * resource_production_upkeep_multiplier,
+        "farm": 300 * resource_production_upkeep_multiplier,
+        "oil_well": 600 * resource_production_upkeep_multiplier,
+        "bauxite_mine": 1600 * resource_production_upkeep_multiplier,
+        "uranium_mine": 5000 * resource_production_upkeep_multiplier,
+        "oil_refinery": 4000 * resource_production_upkeep_multiplier,
+        "steel_mill": 4000 * resource_production_upkeep_multiplier,
+        "aluminum_refinery": 2500 * resource_production_upkeep_multiplier,
+        "munitions_factory": 3500 * resource_production_upkeep_multiplier,
+        "police_station": 750,
+        "hospital": 1000,
+        "recycling_center": 2500,
+        "subway": 3250,
+        "supermarket": 600,
+        "bank": 1800,
+        "shopping_mall": 5400,
+        "stadium": 12150
+    }
+    pollution_points = {
+        "coal_power": 8,
+        "oil_power": 6,
+        "bauxite_mine": 12,
+        "coal_mine": 12,
+        "farm": 2 * farm_greentech_multiplier,
+        "iron_mine": 12,
+        "lead_mine": 12,
+        "oil_well": 12,
+        "uranium_mine": 20,
+        "oil_refinery": 32 * manu_greentech_multiplier,
+        "steel_mill": 40 * manu_greentech_multiplier,
+        "aluminum_refinery": 40 * manu_greentech_multiplier,
+        "munitions_factory": 32 * manu_greentech_multiplier,
+        "police_station": 1,
+        "hospital": 4,
+        "recycling_center": -recycling_pollution_reduction,
+        "subway": -(45 + subway_greentech_addition),
+        "shopping_mall": 2,
+        "stadium": 5
+    }
+    upkeep_coefficients = np.array([upkeep_costs.get(name, 0) for name in CITY_BUILDINGS], dtype=np.float64)
+    pollution_coefficients = np.array([pollution_points.get(name, 0) for name in CITY_BUILDINGS], dtype=np.float64)
+    
+    improvement_upkeep += buildings.sum(axis=0) @ upkeep_coefficients
+    pollution_index = buildings @ pollution_coefficients
+    
+    # Calcul des modificateurs finaux
+    police_modifier = police_station * police_modifier_modifier
+    pollution_modifier = pollution_index * 0.05
+    hospital_modifier = hospital * hospital_modifier_modifier
+    
+    # ----- TAUX DE CRIMINALITÉ ET DE MALADIE -----
+    crime_rate = (((103 - commerce)*(103 - commerce)) + (infra * 100))/(111111) - police_modifier
+    disease_rate = ((((population_density*population_density) * 0.01) - 25)/100) + (base_population/100000) + pollution_modifier - hospital_modifier
+    
+    # ----- POPULATION FINALE -----
+    population = base_population - (np.maximum(((disease_rate * 100 * infra)/100), 0)) - (np.maximum((crime_rate / 10) * (100*infra) - 25, 0))
+    population = population * (1 + ln_age/15)
+    
+    # ----- CALCUL DU REVENU -----
+    city_gross_income += ((((commerce / 50) * 0.725) + 0.725) * population).sum()
     
     # ----- CALCUL DES COÛTS MILITAIRES -----
     # Formule de consommation de nourriture par les soldats
     if nation["offensive_wars_count"] + nation["defensive_wars_count"] == 0:  # Temps de paix
         soldier_formula = nation["soldiers"] / 750
-        income["military_upkeep"] += (nation["soldiers"] * 1.25) + (nation["tanks"] * 50) + (nation["aircraft"] * 500) + (nation["ships"] * 3375) + (nation["missiles"] * 21000) + (nation["nukes"] * 35000)
+        military_upkeep += (nation["soldiers"] * 1.25) + (nation["tanks"] * 50) + (nation["aircraft"] * 500) + (nation["ships"] * 3375) + (nation["missiles"] * 21000) + (nation["nukes"] * 35000)
     else:  # Temps de guerre
         soldier_formula = nation["soldiers"] / 500
-        income["military_upkeep"] += (nation["soldiers"] * 1.88) + (nation["tanks"] * 75) + (nation["aircraft"] * 750) + (nation["ships"] * 5062.50) + (nation["missiles"] * 31500) + (nation["nukes"] * 52500)
+        military_upkeep += (nation["soldiers"] * 1.88) + (nation["tanks"] * 75) + (nation["aircraft"] * 750) + (nation["ships"] * 5062.50) + (nation["missiles"] * 31500) + (nation["nukes"] * 52500)
     
     # Coût des espions
-    income["military_upkeep"] += nation["spies"] * 2400
+    military_upkeep += nation["spies"] * 2400
     
     # Consommation de nourriture par les soldats
-    production["food"] -= soldier_formula
+    food -= soldier_formula
     
     # ----- POLITIQUE INTÉRIEURE -----
     domestic_policy_increase = 1
@@ -737,9 +1043,27 @@ async def calculate_nation_revenue(nation_id):
             domestic_policy_increase += 0.25
     
     if nation["domestic_policy"] == 'OPEN_MARKETS':
-        income["gross_income"] = income["gross_income"] * (1 + (0.01 * domestic_policy_increase))
+        city_gross_income = city_gross_income * (1 + (0.01 * domestic_policy_increase))
     elif nation["domestic_policy"] == 'IMPERIALISM':
-        income["military_upkeep"] = income["military_upkeep"] * (1 - (0.05 * domestic_policy_increase))
+        military_upkeep = military_upkeep * (1 - (0.05 * domestic_policy_increase))
+    
+    # Regrouper les résultats (en floats Python plutôt qu'en scalaires NumPy)
+    production = NationProduction(
+        food=float(food),
+        uranium=float(uranium),
+        oil=float(oil),
+        iron=float(iron),
+        coal=float(coal),
+        bauxite=float(bauxite),
+        lead=float(lead),
+        aluminum=float(aluminum),
+        gasoline=float(gasoline),
+        munitions=float(munitions),
+        steel=float(steel)
+    )
+    city_gross_income = float(city_gross_income)
+    military_upkeep = float(military_upkeep)
+    improvement_upkeep = float(improvement_upkeep)
     
     # ----- BONUS DE COULEUR -----
     color_bonus = 0
@@ -751,62 +1075,52 @@ async def calculate_nation_revenue(nation_id):
     
     # ----- CALCUL DE LA VALEUR MONÉTAIRE DES RESSOURCES -----
     total_monetary_value = 0
-    monetary_resources = {}
-    
-    for resource, amount in production.items():
-        price = float(market_prices.get(resource, 0))
-        monetary_value = amount * price
-        total_monetary_value += monetary_value
-        monetary_resources[resource] = {
-            "amount": amount,
-            "value": monetary_value
-        }
+    for resource, amount in zip(REVENUE_RESOURCES, production):
+        total_monetary_value += amount * prices[resource]
     
     # ----- CALCUL DU REVENU NET -----
-    gross_income = color_bonus + income["gross_income"]
-    gross_upkeep = income["improvement_upkeep"] + income["military_upkeep"]
+    gross_income = color_bonus + city_gross_income
+    gross_upkeep = improvement_upkeep + military_upkeep
     net_income = gross_income - gross_upkeep
     monetary_net_income = net_income + total_monetary_value
     
-    # Résultat
-    return {
-        "nation_name": nation["nation_name"],
-        "flag": nation["flag"],
-        "num_cities": nation["num_cities"],
-        "production": production,
-        "monetary_resources": monetary_resources,
-        "total_monetary_value": total_monetary_value,
-        "income": {
-            "gross_income": income["gross_income"],
-            "color_bonus": color_bonus,
-            "gross_total": gross_income,
-            "military_upkeep": income["military_upkeep"],
-            "improvement_upkeep": income["improvement_upkeep"],
-            "gross_upkeep": gross_upkeep,
-            "net_income": net_income,
-            "monetary_net_income": monetary_net_income
-        }
-    }
+    income = NationIncome(
+        gross_income=city_gross_income,
+        color_bonus=color_bonus,
+        gross_total=gross_income,
+        military_upkeep=military_upkeep,
+        improvement_upkeep=improvement_upkeep,
+        gross_upkeep=gross_upkeep,
+        net_income=net_income,
+        monetary_net_income=monetary_net_income
+    )
+    
+    return production, income, total_monetary_value
+
+# Clé de tri du classement des membres
+_total_income_key = operator.itemgetter("total_income")
 
-async def calculate_alliance_revenue(alliance_id):
+async def calculate_alliance_revenue(alliance_id, top_k=None):
     """
     Calcule le revenu journalier de toute une alliance.
     
     Args:
         alliance_id (int): L'ID de l'alliance
+        top_k (int): Ne conserver que les top_k meilleures nations dans member_results (toutes si None)
         
     Returns:
         dict: Détails du revenu journalier de l'alliance
     """
-    # Récupérer les données de l'alliance
-    alliance_data = await fetch_alliance_data(alliance_id)
+    # Récupérer en une requête l'alliance et les données de revenu de tous ses membres,
+    # ainsi que les informations de jeu et les prix du marché (une seule fois pour tous les membres)
+    alliance_data, game_info, color_bonuses, market_prices = await asyncio.gather(
+        fetch_alliance_data(alliance_id, with_revenue_fields=True),
+        fetch_game_info(),
+        fetch_color_data(),
+        get_pnw_market_prices()
+    )
     if not alliance_data:
-        return {"error": "Alliance non trouvée"}
-    
-    # Récupérer les informations de jeu et les prix du marché (une seule fois pour tous les membres)
-    game_info = await fetch_game_info()
-    color_bonuses = await fetch_color_data()
-    market_prices = await get_pnw_market_prices()
+        return {"error": "Alliance non trouvée"}
     
     if not game_info:
         return {"error": "Impossible de récupérer les informations du jeu"}
@@ -814,26 +1128,12 @@ async def calculate_alliance_revenue(alliance_id):
     # Filtrer pour ne prendre que les membres (pas les candidats)
     member_nations = [nation for nation in alliance_data["nations"] if nation["alliance_position"] != "APPLICANT"]
     
-    # Initialiser les variables pour agréger les résultats
-    alliance_production = {
-        "food": 0, "uranium": 0, "oil": 0, "iron": 0, "coal": 0,
-        "bauxite": 0, "lead": 0, "aluminum": 0, "gasoline": 0,
-        "munitions": 0, "steel": 0
-    }
-    
-    alliance_income = {
-        "gross_income": 0,
-        "color_bonus": 0,
-        "gross_total": 0,
-        "military_upkeep": 0,
-        "improvement_upkeep": 0,
-        "gross_upkeep": 0,
-        "net_income": 0,
-        "monetary_net_income": 0
-    }
+    # Prix convertis une seule fois pour tous les membres
+    prices = revenue_prices(market_prices)
     
-    alliance_total_monetary_value = 0
-    alliance_monetary_resources = {resource: {"amount": 0, "value": 0} for resource in alliance_production}
+    # Une ligne par nation traitée (structure de tableaux), sommées en une seule réduction à la fin
+    production_rows = []
+    income_rows = []
     
     total_cities = 0
     processed_nations = 0
@@ -848,53 +1148,47 @@ async def calculate_alliance_revenue(alliance_id):
         try:
             nation_id = nation["id"]
             
-            # Calculer le revenu de cette nation
-            nation_revenue = await calculate_nation_revenue(nation_id)
-            
-            # Si une erreur est survenue, passer à la nation suivante
-            if "error" in nation_revenue:
-                failed_nations += 1
-                continue
-            
-            # Ajouter les résultats au total de l'alliance
-            for resource in alliance_production:
-                alliance_production[resource] += nation_revenue["production"].get(resource, 0)
-                if resource in nation_revenue["monetary_resources"]:
-                    alliance_monetary_resources[resource]["amount"] += nation_revenue["monetary_resources"][resource]["amount"]
-                    alliance_monetary_resources[resource]["value"] += nation_revenue["monetary_resources"][resource]["value"]
-            
-            alliance_total_monetary_value += nation_revenue["total_monetary_value"]
+            # Calculer le revenu de cette nation à partir des données déjà récupérées :
+            # les tuples nommés sont déjà dans l'ordre des colonnes des tableaux de l'alliance
+            production, income, _ = nation_revenue_rows(nation, game_info, color_bonuses, prices, alliance_color)
+            production_rows.append(production)
+            income_rows.append(income)
             
-            alliance_income["gross_income"] += nation_revenue["income"]["gross_income"]
-            alliance_income["color_bonus"] += nation_revenue["income"]["color_bonus"]
-            alliance_income["gross_total"] += nation_revenue["income"]["gross_total"]
-            alliance_income["military_upkeep"] += nation_revenue["income"]["military_upkeep"]
-            alliance_income["improvement_upkeep"] += nation_revenue["income"]["improvement_upkeep"]
-            alliance_income["gross_upkeep"] += nation_revenue["income"]["gross_upkeep"]
-            alliance_income["net_income"] += nation_revenue["income"]["net_income"]
-            alliance_income["monetary_net_income"] += nation_revenue["income"]["monetary_net_income"]
-            
-            total_cities += nation_revenue["num_cities"]
+            total_cities += nation["num_cities"]
             processed_nations += 1
             
             # Conserver les résultats individuels pour l'affichage
             member_results.append({
                 "id": nation_id,
-                "name": nation_revenue["nation_name"],
-                "cities": nation_revenue["num_cities"],
-                "net_income": nation_revenue["income"]["net_income"],
-                "total_income": nation_revenue["income"]["monetary_net_income"]
+                "name": nation["nation_name"],
+                "cities": nation["num_cities"],
+                "net_income": income.net_income,
+                "total_income": income.monetary_net_income
             })
             
-            # Pause pour éviter de surcharger l'API
-            await asyncio.sleep(5)
-            
         except Exception as e:
             print(f"Erreur lors du traitement de la nation ID {nation['id']}: {e}")
             failed_nations += 1
     
-    # Trier les nations par revenu total
-    member_results.sort(key=lambda x: x["total_income"], reverse=True)
+    # Trier les nations par revenu total (sélection partielle si seul le haut du classement est affiché)
+    if top_k is not None:
+        member_results = heapq.nlargest(top_k, member_results, key=_total_income_key)
+    else:
+        member_results.sort(key=_total_income_key, reverse=True)
+    
+    # Totaux de l'alliance : une somme par colonne, puis valorisation au prix du marché
+    production_totals = np.array(production_rows, dtype=np.float64).reshape(-1, len(REVENUE_RESOURCES)).sum(axis=0)
+    income_totals = np.array(income_rows, dtype=np.float64).reshape(-1, len(REVENUE_INCOME_KEYS)).sum(axis=0)
+    prices_vec = np.array([prices[resource] for resource in REVENUE_RESOURCES])
+    value_totals = production_totals * prices_vec
+    
+    alliance_production = {resource: float(amount) for resource, amount in zip(REVENUE_RESOURCES, production_totals)}
+    alliance_monetary_resources = {
+        resource: {"amount": float(amount), "value": float(value)}
+        for resource, amount, value in zip(REVENUE_RESOURCES, production_totals, value_totals)
+    }
+    alliance_total_monetary_value = float(value_totals.sum())
+    alliance_income = {key: float(total) for key, total in zip(REVENUE_INCOME_KEYS, income_totals)}
     
     # Résultat
     return {
@@ -910,80 +1204,82 @@ async def calculate_alliance_revenue(alliance_id):
         "member_results": member_results
     }
 
-def load_bank_history():
-    """Load the bank and member resources history data from file."""
-    if os.path.exists(BANK_HISTORY_FILE):
-        try:
-            with open(BANK_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode {BANK_HISTORY_FILE}, creating new history data")
-            return {"alliance_id": None, "bank_records": [], "member_resources_records": []}
-    return {"alliance_id": None, "bank_records": [], "member_resources_records": []}
+ALLIANCE_QUERY = """
+query($id: [Int]) {
+    alliances(first: 1, id: $id) {
+        data {
+            id
+            name
+            color
+            nations {
+                id
+                nation_name
+                alliance_position
+            }
+        }
+    }
+}
+"""
 
-def save_bank_history(history_data):
-    """Save the bank and member resources history data to file."""
-    with open(BANK_HISTORY_FILE, 'w') as f:
-        json.dump(history_data, f, indent=2)
+# Same alliance lookup, with every field compute_nation_revenue needs for each member
+ALLIANCE_REVENUE_QUERY = """
+query($id: [Int]) {
+    alliances(first: 1, id: $id) {
+        data {
+            id
+            name
+            color
+            nations {
+                id
+                alliance_position""" + NATION_REVENUE_FIELDS + """
+            }
+        }
+    }
+}
+"""
 
-async def fetch_alliance_data(alliance_id):
+async def fetch_alliance_data(alliance_id, with_revenue_fields=False):
     """
     Fetch comprehensive data about an alliance including members.
     
     Args:
         alliance_id (int): The ID of the alliance
+        with_revenue_fields (bool): Also fetch each member's revenue data (cities, projects, military)
         
     Returns:
         dict: Alliance data including members
     """
-    query = """
-    query {
-        alliances(first: 1, id: [""" + str(alliance_id) + """]) {
-            data {
-                id
-                name
-                nations {
-                    id
-                    nation_name
-                    alliance_position
-                }
-            }
-        }
-    }
-    """
-    payload = {"query": query}
+    query = ALLIANCE_REVENUE_QUERY if with_revenue_fields else ALLIANCE_QUERY
+    payload = {"query": query, "variables": {"id": [int(alliance_id)]}}
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if (data.get("data") and data["data"].get("alliances") and 
-                    data["data"]["alliances"].get("data") and len(data["data"]["alliances"]["data"]) > 0):
-                    return data["data"]["alliances"]["data"][0]
-                else:
-                    print(f"Error: Alliance data not found - {data}")
-                    return None
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    timeout = BULK_API_TIMEOUT if with_revenue_fields else API_TIMEOUT
+    max_bytes = BULK_MAX_RESPONSE_BYTES if with_revenue_fields else MAX_RESPONSE_BYTES
+    async with session.post(PNW_API_BASE_URL, json=payload, headers=headers, timeout=timeout) as response:
+        if response.status == 200:
+            data = await read_json_response(response, max_bytes=max_bytes)
+            if (data.get("data") and data["data"].get("alliances") and 
+                data["data"]["alliances"].get("data") and len(data["data"]["alliances"]["data"]) > 0):
+                return data["data"]["alliances"]["data"][0]
             else:
-                print(f"Error: Failed to fetch alliance data - Status {response.status}")
+                print(f"Error: Alliance data not found - {data}")
                 return None
+        else:
+            print(f"Error: Failed to fetch alliance data - Status {response.status}")
+            return None
 
-async def fetch_nation_resources(nation_id):
-    """
-    Fetch resource data for a specific nation.
-    
-    Args:
-        nation_id (int): The ID of the nation
-        
-    Returns:
-        dict: Resources data for each resource type
-    """
-    query = """
-    query {
-        nations(first: 1, id: [""" + str(nation_id) + """]) {
-            data {
+ALLIANCE_MEMBER_RESOURCES_QUERY = """
+query($id: [Int]) {
+    alliances(first: 1, id: $id) {
+        data {
+            id
+            name
+            nations {
                 id
                 nation_name
+                alliance_position
                 money
                 coal
                 oil
@@ -999,38 +1295,42 @@ async def fetch_nation_resources(nation_id):
             }
         }
     }
+}
+"""
+
+async def fetch_alliance_member_resources(alliance_id):
+    """
+    Fetch the resource stockpiles of every nation in an alliance in a single request.
+    
+    Args:
+        alliance_id (int): The ID of the alliance
+        
+    Returns:
+        dict: Alliance data with each nation's position and resources
     """
-    payload = {"query": query}
+    payload = {"query": ALLIANCE_MEMBER_RESOURCES_QUERY, "variables": {"id": [int(alliance_id)]}}
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if (data.get("data") and data["data"].get("nations") and 
-                    data["data"]["nations"].get("data") and len(data["data"]["nations"]["data"]) > 0):
-                    nation_data = data["data"]["nations"]["data"][0]
-                    return {
-                        "nation_name": nation_data["nation_name"],
-                        "money": nation_data.get("money", 0),
-                        "food": nation_data.get("food", 0),
-                        "steel": nation_data.get("steel", 0),
-                        "aluminum": nation_data.get("aluminum", 0),
-                        "gasoline": nation_data.get("gasoline", 0),
-                        "munitions": nation_data.get("munitions", 0),
-                        "uranium": nation_data.get("uranium", 0),
-                        "coal": nation_data.get("coal", 0),
-                        "oil": nation_data.get("oil", 0),
-                        "iron": nation_data.get("iron", 0),
-                        "lead": nation_data.get("lead", 0),
-                        "bauxite": nation_data.get("bauxite", 0),
-                    }
-                else:
-                    print(f"Error: Nation data not found - {data}")
-                    return None
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
+        if response.status == 200:
+            data = await read_json_response(response)
+            if (data.get("data") and data["data"].get("alliances") and 
+                data["data"]["alliances"].get("data") and len(data["data"]["alliances"]["data"]) > 0):
+                return data["data"]["alliances"]["data"][0]
             else:
-                print(f"Error: Failed to fetch nation data - Status {response.status}")
+                print(f"Error: Alliance data not found - {data}")
                 return None
+        else:
+            print(f"Error: Failed to fetch alliance member resources - Status {response.status}")
+            return None
+
+# Resources summed across members, in the order they are stored in member resources records
+MEMBER_RESOURCE_KEYS = (
+    "money", "food", "steel", "aluminum", "gasoline", "munitions",
+    "uranium", "coal", "oil", "iron", "lead", "bauxite"
+)
 
 async def fetch_and_aggregate_member_resources(alliance_id):
     """
@@ -1042,37 +1342,66 @@ async def fetch_and_aggregate_member_resources(alliance_id):
     Returns:
         dict: Aggregated resources and total value
     """
-    alliance_data = await fetch_alliance_data(alliance_id)
+    # One request for every member's stockpile, alongside the market prices
+    alliance_data, market_prices = await asyncio.gather(
+        fetch_alliance_member_resources(alliance_id),
+        get_pnw_market_prices()
+    )
     if not alliance_data:
         return None
     
     member_nations = [nation for nation in alliance_data["nations"] if nation["alliance_position"] != "APPLICANT"]
-    member_nation_ids = [nation["id"] for nation in member_nations]
     
-    total_resources = {
-        "money": 0, "food": 0, "steel": 0, "aluminum": 0, "gasoline": 0,
-        "munitions": 0, "uranium": 0, "coal": 0, "oil": 0, "iron": 0,
-        "lead": 0, "bauxite": 0,
-    }
-    
-    for nation_id in member_nation_ids:
-        resources_data = await fetch_nation_resources(nation_id)
-        if resources_data:
-            for resource in total_resources.keys():
-                if resource in resources_data:
-                    total_resources[resource] += resources_data[resource]
-        await asyncio.sleep(0.8)  # Avoid rate limiting
+    # One row per member, one column per resource, summed in a single reduction
+    stockpiles = np.array(
+        [[nation.get(resource) or 0 for resource in MEMBER_RESOURCE_KEYS] for nation in member_nations],
+        dtype=np.float64
+    ).reshape(-1, len(MEMBER_RESOURCE_KEYS))
+    resource_totals = stockpiles.sum(axis=0)
     
-    market_prices = await get_pnw_market_prices()
-    total_value = 0
-    for resource, amount in total_resources.items():
-        if resource == "money":
-            total_value += amount
-        else:
-            total_value += amount * market_prices.get(resource, 0)
+    # Money counts at face value, everything else at market price
+    prices_vec = np.array([1.0 if resource == "money" else float(market_prices.get(resource, 0)) for resource in MEMBER_RESOURCE_KEYS])
+    total_value = float(resource_totals @ prices_vec)
     
+    total_resources = dict(zip(MEMBER_RESOURCE_KEYS, resource_totals.tolist()))
     return {"resources": total_resources, "total_value": total_value}
 
+# Requête des taxrecs sans filtre after (le filtrage par date se fait côté client)
+ALLIANCE_TAX_RECORDS_QUERY = """
+query($id: [Int]) {
+    alliances(first: 1, id: $id) {
+        data {
+            id
+            name
+            taxrecs(
+                orderBy: {column: DATE, order: DESC}
+            ) {
+                id
+                date
+                sender_id
+                sender_type
+                receiver_id
+                receiver_type
+                note
+                money
+                coal
+                oil
+                uranium
+                iron
+                bauxite
+                lead
+                gasoline
+                munitions
+                steel
+                aluminum
+                food
+                tax_id
+            }
+        }
+    }
+}
+"""
+
 async def fetch_alliance_tax_records(alliance_id, days=14):
     """
     Récupère les enregistrements fiscaux d'une alliance sans utiliser de filtre.
@@ -1085,130 +1414,139 @@ async def fetch_alliance_tax_records(alliance_id, days=14):
     Returns:
         dict: Données d'alliance avec liste des enregistrements fiscaux
     """
-    # Requête sans filtre after
-    query = """
-    query {
-        alliances(first: 1, id: [""" + str(alliance_id) + """]) {
-            data {
-                id
-                name
-                taxrecs(
-                    orderBy: {column: DATE, order: DESC}
-                ) {
-                    id
-                    date
-                    sender_id
-                    sender_type
-                    receiver_id
-                    receiver_type
-                    note
-                    money
-                    coal
-                    oil
-                    uranium
-                    iron
-                    bauxite
-                    lead
-                    gasoline
-                    munitions
-                    steel
-                    aluminum
-                    food
-                    tax_id
-                }
-            }
-        }
-    }
-    """
-    
-    payload = {"query": query}
+    payload = {"query": ALLIANCE_TAX_RECORDS_QUERY, "variables": {"id": [int(alliance_id)]}}
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {PNW_API_KEY}"}
     
     print(f"Envoi requête simple sans filtre pour alliance_id={alliance_id}")
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(PNW_API_BASE_URL, json=payload, headers=headers) as response:
-                print(f"Statut réponse API: {response.status}")
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if data and "errors" not in data and data.get("data") and data["data"].get("alliances") and data["data"]["alliances"].get("data"):
-                        if len(data["data"]["alliances"]["data"]) > 0:
-                            alliance_data = data["data"]["alliances"]["data"][0]
-                            alliance_name = alliance_data.get("name", "Unknown Alliance")
-                            print(f"Données alliance trouvées: {alliance_name}")
+    session = await get_session()
+    await pnw_api_limiter.acquire()
+    try:
+        async with session.post(PNW_API_BASE_URL, json=payload, headers=headers, timeout=BULK_API_TIMEOUT) as response:
+            print(f"Statut réponse API: {response.status}")
+            if response.status == 200:
+                data = await read_json_response(response, max_bytes=BULK_MAX_RESPONSE_BYTES)
+                
+                if data and "errors" not in data and data.get("data") and data["data"].get("alliances") and data["data"]["alliances"].get("data"):
+                    if len(data["data"]["alliances"]["data"]) > 0:
+                        alliance_data = data["data"]["alliances"]["data"][0]
+                        alliance_name = alliance_data.get("name", "Unknown Alliance")
+                        print(f"Données alliance trouvées: {alliance_name}")
+                        
+                        if "taxrecs" in alliance_data and alliance_data["taxrecs"]:
+                            tax_records = alliance_data["taxrecs"]
+                            print(f"Nombre d'enregistrements fiscaux bruts: {len(tax_records)}")
                             
-                            if "taxrecs" in alliance_data and alliance_data["taxrecs"]:
-                                tax_records = alliance_data["taxrecs"]
-                                print(f"Nombre d'enregistrements fiscaux bruts: {len(tax_records)}")
-                                
-                                # Créer une date limite il y a 'days' jours
-                                cutoff_date = datetime.now() - timedelta(days=days)
-                                
-                                filtered_records = []
-                                for record in tax_records:
-                                    if "date" in record:
-                                        try:
-                                            # Convertir la date de l'enregistrement en naive datetime
-                                            record_date_str = record["date"].replace('Z', '').split('+')[0]
-                                            record_date = datetime.fromisoformat(record_date_str)
-                                            
-                                            # Comparaison de deux naive datetimes
-                                            if record_date >= cutoff_date:
-                                                filtered_records.append(record)
-                                        except ValueError as e:
-                                            print(f"Erreur de parsing de date: {e} pour {record.get('date')}")
-                                
-                                print(f"Après filtrage: {len(filtered_records)} enregistrements dans les {days} derniers jours")
-                                
-                                return {
-                                    "name": alliance_name,
-                                    "tax_records": filtered_records
-                                }
-                            else:
-                                print("Aucun enregistrement fiscal trouvé")
+                            # Créer une date limite (UTC) il y a 'days' jours
+                            cutoff_date = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=days)
+                            
+                            # Analyser toutes les dates en une fois ; les dates invalides deviennent NaT et sont exclues
+                            record_dates = pd.to_datetime(
+                                [record.get("date") for record in tax_records],
+                                utc=True, format='ISO8601', errors='coerce', cache=True
+                            )
+                            invalid_dates = int(record_dates.isna().sum())
+                            if invalid_dates:
+                                print(f"Erreur de parsing de date pour {invalid_dates} enregistrements")
+                            
+                            recent = record_dates >= cutoff_date
+                            filtered_records = [record for record, keep in zip(tax_records, recent) if keep]
+                            
+                            print(f"Après filtrage: {len(filtered_records)} enregistrements dans les {days} derniers jours")
+                            
+                            return {
+                                "name": alliance_name,
+                                "tax_records": filtered_records
+                            }
                         else:
-                            print(f"Aucune alliance trouvée avec l'ID {alliance_id}")
+                            print("Aucun enregistrement fiscal trouvé")
                     else:
-                        print(f"Erreurs dans la réponse API: {data.get('errors', 'Erreur inconnue')}")
+                        print(f"Aucune alliance trouvée avec l'ID {alliance_id}")
                 else:
-                    print(f"Erreur API: {response.status}, contenu: {await response.text()}")
-        except Exception as e:
-            print(f"Exception lors de la requête API: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+                    print(f"Erreurs dans la réponse API: {data.get('errors', 'Erreur inconnue')}")
+            else:
+                print(f"Erreur API: {response.status}, contenu: {await response.text()}")
+    except Exception as e:
+        print(f"Exception lors de la requête API: {type(e).__name__}: {e}")
+        import traceback
+        traceback.print_exc()
     
     return {"name": "Unknown Alliance", "tax_records": []}
 
 
+# Dernier historique des taxes chargé ou enregistré, indexé par le (mtime, taille) du fichier
+_tax_history_cache = {"stamp": None, "data": None}
+
 def load_tax_history():
-    """Charge l'historique des taxes depuis le fichier."""
-    if os.path.exists(TAX_HISTORY_FILE):
-        try:
-            with open(TAX_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode {TAX_HISTORY_FILE}, creating new history data")
-            return {"alliances": {}}
-    return {"alliances": {}}
+    """Charge l'historique des taxes depuis le fichier.
+    
+    Le résultat est gardé en mémoire et relu seulement si le fichier a changé sur le disque ;
+    le même dict est renvoyé à chaque appel : qui le modifie doit l'enregistrer.
+    """
+    stamp = _file_stamp(TAX_HISTORY_FILE)
+    if stamp is None:
+        return {"alliances": {}}
+    if stamp == _tax_history_cache["stamp"]:
+        return _tax_history_cache["data"]
+    try:
+        with open(TAX_HISTORY_FILE, 'rb') as f:
+            data = orjson.loads(f.read())
+    except orjson.JSONDecodeError:
+        print(f"Error: Could not decode {TAX_HISTORY_FILE}, creating new history data")
+        return {"alliances": {}}
+    _tax_history_cache.update(stamp=stamp, data=data)
+    return data
 
 def save_tax_history(tax_history):
     """Enregistre l'historique des taxes dans le fichier."""
-    with open(TAX_HISTORY_FILE, 'w') as f:
-        json.dump(tax_history, f, indent=2)
+    with open(TAX_HISTORY_FILE, 'wb') as f:
+        f.write(orjson.dumps(tax_history, option=HISTORY_JSON_OPTIONS))
+    _tax_history_cache.update(stamp=_file_stamp(TAX_HISTORY_FILE), data=tax_history)
+
+# Protège la séquence chargement-modification-écriture, les E/S cédant la main à la boucle
+tax_history_lock = asyncio.Lock()
+
+async def aload_tax_history():
+    """Charge l'historique des taxes dans un thread pour ne pas bloquer la boucle d'événements."""
+    return await asyncio.to_thread(load_tax_history)
+
+async def asave_tax_history(tax_history):
+    """Enregistre l'historique des taxes dans un thread pour ne pas bloquer la boucle d'événements."""
+    await asyncio.to_thread(save_tax_history, tax_history)
 
 async def process_alliance_tax_data(alliance_id, days=14):
     """
     Récupère, traite et stocke les données fiscales d'une alliance regroupées par jour.
     
+    Les commandes tax_* sont souvent lancées à la suite : le résultat récent est réutilisé,
+    et des appels simultanés pour la même alliance attendent un seul calcul.
+    
     Args:
         alliance_id (int): ID de l'alliance
         days (int): Nombre de jours d'historique à récupérer
         
     Returns:
-        dict: Données fiscales quotidiennes
+        dict: Données fiscales quotidiennes (partagées entre les appelants : ne pas les modifier)
     """
+    key = (alliance_id, days)
+    cache = _tax_data_cache.setdefault(key, {"value": None, "expires": 0})
+    cached = _get_cached(cache)
+    if cached is not None:
+        return cached
+    
+    async with _tax_data_locks.setdefault(key, asyncio.Lock()):
+        # Un autre appel a pu calculer le résultat pendant l'attente
+        cached = _get_cached(cache)
+        if cached is not None:
+            return cached
+        result = await _compute_alliance_tax_data(alliance_id, days)
+        # Un résultat vide (erreur d'API, alliance sans taxes) n'est pas conservé
+        if result["daily_records"]:
+            _set_cached(cache, result, TAX_DATA_TTL)
+        return result
+
+async def _compute_alliance_tax_data(alliance_id, days):
+    """Récupère les enregistrements fiscaux, les regroupe par jour et met à jour l'historique."""
     # Récupérer les enregistrements fiscaux
     tax_data = await fetch_alliance_tax_records(alliance_id, days)
     alliance_name = tax_data["name"]
@@ -1221,72 +1559,55 @@ async def process_alliance_tax_data(alliance_id, days=14):
     # Obtenir les prix du marché pour calculer les valeurs
     market_prices = await get_pnw_market_prices()
     
-    # Grouper les enregistrements par jour
-    daily_records = {}
+    # Grouper les enregistrements de taxes par jour (les autres transactions n'ont pas de tax_id)
+    df = pd.DataFrame(tax_records)
+    df = df[df["tax_id"].fillna(0).astype(bool)].copy()
+    df[TAX_RESOURCES] = df[TAX_RESOURCES].fillna(0).astype("float64")
     
-    for record in tax_records:
-        if not record.get("tax_id"):
-            continue  # Ignorer les enregistrements qui ne sont pas des taxes
-        
-        try:
-            # Convertir la date au format YYYY-MM-DD
-            record_date = datetime.fromisoformat(record["date"].replace('Z', '+00:00'))
-            date_str = record_date.strftime("%Y-%m-%d")
-            
-            # Initialiser le dictionnaire pour ce jour s'il n'existe pas encore
-            if date_str not in daily_records:
-                daily_records[date_str] = {
-                    "date": date_str,
-                    "money": 0,
-                    "coal": 0,
-                    "oil": 0,
-                    "uranium": 0,
-                    "iron": 0,
-                    "bauxite": 0,
-                    "lead": 0,
-                    "gasoline": 0,
-                    "munitions": 0,
-                    "steel": 0,
-                    "aluminum": 0,
-                    "food": 0,
-                    "count": 0,
-                    "total_value": 0
-                }
-            
-            # Ajouter les ressources à ce jour
-            daily_records[date_str]["count"] += 1
-            for resource in ["money", "coal", "oil", "uranium", "iron", "bauxite", "lead", "gasoline", "munitions", "steel", "aluminum", "food"]:
-                if resource in record and record[resource]:
-                    daily_records[date_str][resource] += record[resource]
-        
-        except (ValueError, KeyError) as e:
-            print(f"Erreur lors du traitement d'un enregistrement fiscal: {e}")
-            continue
-    
-    # Calculer la valeur totale pour chaque jour
-    for date_str, day_data in daily_records.items():
-        total_value = day_data["money"]
-        for resource, amount in day_data.items():
-            if resource not in ["date", "money", "count", "total_value"] and amount > 0:
-                total_value += amount * market_prices.get(resource, 0)
-        day_data["total_value"] = total_value
-    
-    # Charger l'historique existant
-    tax_history = load_tax_history()
-    
-    # S'assurer que l'entrée pour cette alliance existe
-    if str(alliance_id) not in tax_history["alliances"]:
-        tax_history["alliances"][str(alliance_id)] = {
-            "name": alliance_name,
-            "daily_records": {}
-        }
+    # Un code entier par jour (YYYY-MM-DD) et une matrice contiguë jours x ressources
+    day_codes, day_labels = pd.factorize(df["date"].str[:10], sort=True)
+    values = np.ascontiguousarray(df[TAX_RESOURCES].to_numpy(dtype=np.float64))
+    day_count = len(day_labels)
     
-    # Mettre à jour les enregistrements quotidiens
-    for date_str, day_data in daily_records.items():
-        tax_history["alliances"][str(alliance_id)]["daily_records"][date_str] = day_data
+    # Sommes par jour : un bincount pondéré par ressource
+    totals = np.column_stack([
+        np.bincount(day_codes, weights=values[:, j], minlength=day_count)
+        for j in range(len(TAX_RESOURCES))
+    ]) if day_count else np.zeros((0, len(TAX_RESOURCES)))
+    counts = np.bincount(day_codes, minlength=day_count)
     
-    # Enregistrer l'historique mis à jour
-    save_tax_history(tax_history)
+    # Valeur totale par jour : l'argent plus les ressources positives au prix du marché
+    price_vec = np.array([float(market_prices.get(resource, 0)) for resource in TAX_RESOURCES[1:]])
+    total_values = totals[:, 0] + np.clip(totals[:, 1:], 0, None) @ price_vec
+    
+    daily_records = {}
+    for i, date_str in enumerate(day_labels):
+        day_data = {"date": date_str}
+        day_data.update(zip(TAX_RESOURCES, totals[i].tolist()))
+        day_data["count"] = int(counts[i])
+        day_data["total_value"] = float(total_values[i])
+        daily_records[date_str] = day_data
+    
+    async with tax_history_lock:
+        # Charger l'historique existant
+        tax_history = await aload_tax_history()
+        
+        # S'assurer que l'entrée pour cette alliance existe
+        if str(alliance_id) not in tax_history["alliances"]:
+            tax_history["alliances"][str(alliance_id)] = {
+                "name": alliance_name,
+                "daily_records": {}
+            }
+        
+        # Mettre à jour les enregistrements quotidiens qui ont changé
+        stored_records = tax_history["alliances"][str(alliance_id)]["daily_records"]
+        changed_days = [date_str for date_str, day_data in daily_records.items() if stored_records.get(date_str) != day_data]
+        for date_str in changed_days:
+            stored_records[date_str] = daily_records[date_str]
+        
+        # Réécrire le fichier uniquement si un jour a été ajouté ou modifié
+        if changed_days:
+            await asave_tax_history(tax_history)
     
     # Convertir le dictionnaire en liste triée par date pour faciliter l'utilisation
     sorted_records = [v for k, v in sorted(daily_records.items())]
@@ -1300,7 +1621,7 @@ async def process_alliance_tax_data(alliance_id, days=14):
 async def hourly_member_resources_collection():
     """Task that runs every hour to collect and store member resources data."""
     try:
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         alliance_id = history_data.get("alliance_id")
         
         if not alliance_id:
@@ -1317,10 +1638,7 @@ async def hourly_member_resources_collection():
                 "resources": aggregated_data["resources"],
                 "total_value": aggregated_data["total_value"]
             }
-            if "member_resources_records" not in history_data:
-                history_data["member_resources_records"] = []
-            history_data["member_resources_records"].append(record)
-            save_bank_history(history_data)
+            await aappend_member_resources_record(record)
             print(f"Collected member resources data for alliance ID {alliance_id} at {timestamp}")
         else:
             print(f"Could not collect member resources data for alliance ID {alliance_id}")
@@ -1336,22 +1654,22 @@ async def before_hourly_member_resources_collection():
 @bot.command(name='set_alliance_id')
 async def set_alliance_id(ctx, alliance_id: int):
     """Set the alliance ID for member resources tracking."""
-    history_data = load_bank_history()
-    history_data["alliance_id"] = alliance_id
-    save_bank_history(history_data)
+    async with bank_history_lock:
+        history_data = await aload_bank_history()
+        history_data["alliance_id"] = alliance_id
+        await asave_bank_history(history_data)
     await ctx.send(f"✅ Alliance ID set to {alliance_id} for member resources tracking.")
 
 @bot.command(name='member_resources_history')
 async def show_member_resources_history(ctx, days: int = 7):
     """Display historical member resources data."""
     try:
-        history_data = load_bank_history()
-        if "member_resources_records" not in history_data or not history_data["member_resources_records"]:
+        if not await ahas_member_resources_records():
             await ctx.send("❌ No member resources history data found. Wait for the hourly collection.")
             return
         
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        filtered_records = [r for r in history_data["member_resources_records"] if r["timestamp"].split()[0] >= cutoff_date]
+        filtered_records = await aload_member_resources_since(cutoff_date)
         
         if not filtered_records:
             await ctx.send(f"❌ No member resources history data found within the last {days} days.")
@@ -1371,7 +1689,7 @@ async def show_member_resources_history(ctx, days: int = 7):
         difference = newest_value - oldest_value
         percent_change = (difference / oldest_value) * 100 if oldest_value else 0
         
-        embed.add_field(name="💰 Total Value", value=f"${newest_value:,.2f}", inline=True)
+        embed.add_field(name="💰 Total Value", value=format_money(newest_value), inline=True)
         embed.add_field(
             name=f"{'📈' if difference >= 0 else '📉'} Change",
             value=f"${difference:,.2f} ({percent_change:.2f}%)",
@@ -1383,121 +1701,492 @@ async def show_member_resources_history(ctx, days: int = 7):
         await ctx.send(f"❌ An error occurred: {str(e)}")
         print(f"Error in show_member_resources_history: {e}")
 
+# Une figure par thread de rendu, effacée puis redessinée à chaque graphique
+_graph_figures = threading.local()
+
+# Rendus limités à quelques threads dédiés : peu de rendus simultanés, et autant de figures au plus
+GRAPH_RENDER_WORKERS = 2
+_graph_executor = ThreadPoolExecutor(max_workers=GRAPH_RENDER_WORKERS, thread_name_prefix="graph")
+
+async def render_graph(render, *args, **kwargs):
+    """
+    Exécute une fonction de rendu dans le pool de threads des graphiques.
+    
+    Args:
+        render: render_line_graph ou render_bar_graph
+        *args, **kwargs: Arguments transmis à la fonction de rendu
+        
+    Returns:
+        io.BytesIO: Image PNG renvoyée par la fonction de rendu
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_graph_executor, functools.partial(render, *args, **kwargs))
+
+# Dernières images rendues (octets PNG) par clé de données, la plus récemment utilisée en dernier
+GRAPH_PNG_CACHE_SIZE = 32
+_graph_png_cache = {}
+
+async def render_graph_cached(key, render, *args, **kwargs):
+    """
+    Comme render_graph, mais réutilise l'image déjà rendue pour la même clé.
+    
+    Args:
+        key (tuple): Clé hachable décrivant entièrement les données tracées
+        render: render_line_graph ou render_bar_graph
+        *args, **kwargs: Arguments transmis à la fonction de rendu
+        
+    Returns:
+        io.BytesIO: Nouveau tampon sur l'image PNG, positionné au début
+    """
+    png = _graph_png_cache.pop(key, None)
+    if png is None:
+        png = (await render_graph(render, *args, **kwargs)).getvalue()
+        if len(_graph_png_cache) >= GRAPH_PNG_CACHE_SIZE:
+            # Évincer l'entrée la moins récemment utilisée (la première insérée)
+            del _graph_png_cache[next(iter(_graph_png_cache))]
+    _graph_png_cache[key] = png
+    return io.BytesIO(png)
+
+# Nombre maximal de points tracés par courbe ; au-delà la série est sous-échantillonnée
+GRAPH_MAX_POINTS = 2000
+# Nombre maximal de marqueurs dessinés par courbe ; au-delà un point sur n en porte un
+GRAPH_MAX_MARKERS = 50
+
+def downsample_minmax(values, n_out=GRAPH_MAX_POINTS):
+    """
+    Choisit les indices à tracer en gardant le minimum et le maximum de chaque tranche.
+    
+    Les pics et les creux restent visibles alors que matplotlib ne dessine plus que
+    n_out points au lieu de toute la série.
+    
+    Args:
+        values: Valeurs de la série, dans l'ordre chronologique
+        n_out (int): Nombre de points visés
+        
+    Returns:
+        numpy.ndarray: Indices triés des points à conserver
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= n_out:
+        return np.arange(n)
+    
+    # Premier et dernier points toujours conservés, min/max de chaque tranche entre les deux
+    n_buckets = max((n_out - 2) // 2, 1)
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+    selected = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = values[start:end]
+            selected.append(start + int(bucket.argmin()))
+            selected.append(start + int(bucket.argmax()))
+    return np.unique(selected)
+
+def _graph_axes(figsize):
+    """
+    Retourne la figure du thread courant, vidée et redimensionnée, avec un nouvel axe.
+    
+    Args:
+        figsize (tuple): Taille de la figure en pouces
+        
+    Returns:
+        tuple: (Figure, Axes)
+    """
+    fig = getattr(_graph_figures, "figure", None)
+    if fig is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)  # Attache le canevas Agg une fois pour toutes
+        _graph_figures.figure = fig
+    fig.clear()
+    fig.set_size_inches(figsize)
+    return fig, fig.subplots()
+
+def _figure_png(fig):
+    """Rend la figure en PNG dans un tampon mémoire positionné au début."""
+    buf = io.BytesIO()
+    fig.canvas.print_png(buf)
+    buf.seek(0)
+    return buf
+
+def render_line_graph(lines, title, ylabel, figsize=(10, 6), legend=False):
+    """
+    Dessine un graphique en courbes et le renvoie en PNG en mémoire.
+    
+    Appelée via render_graph, dans le pool de threads des graphiques, pour ne pas bloquer la boucle d'événements.
+    
+    Args:
+        lines (list): Tuples (x, y, style) où style est un dict d'options pour plot
+        title (str): Titre du graphique
+        ylabel (str): Libellé de l'axe des ordonnées
+        figsize (tuple): Taille de la figure en pouces
+        legend (bool): Afficher la légende
+        
+    Returns:
+        io.BytesIO: Image PNG positionnée au début
+    """
+    # Figure propre au thread, hors de l'état global de pyplot : sûr dans plusieurs threads
+    fig, ax = _graph_axes(figsize)
+    for x, y, style in lines:
+        if len(y) > GRAPH_MAX_POINTS:
+            idxs = downsample_minmax(y)
+            x, y = np.asarray(x)[idxs], np.asarray(y)[idxs]
+        if 'marker' in style and len(y) > GRAPH_MAX_MARKERS:
+            style = {**style, 'markevery': len(y) // GRAPH_MAX_MARKERS}
+        ax.plot(x, y, **style)
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    ax.grid(True, alpha=0.3)
+    if legend:
+        ax.legend()
+    ax.yaxis.set_major_formatter(StrMethodFormatter('{x:,.0f}'))
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    
+    return _figure_png(fig)
+
+def render_bar_graph(labels, values, title, ylabel, figsize=(10, 6)):
+    """
+    Dessine un histogramme et le renvoie en PNG en mémoire.
+    
+    Args:
+        labels (list): Libellés des barres
+        values (list): Hauteurs des barres
+        title (str): Titre du graphique
+        ylabel (str): Libellé de l'axe des ordonnées
+        figsize (tuple): Taille de la figure en pouces
+        
+    Returns:
+        io.BytesIO: Image PNG positionnée au début
+    """
+    fig, ax = _graph_axes(figsize)
+    ax.bar(labels, values, color='gold')
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    
+    return _figure_png(fig)
+
 @bot.command(name='member_resources_graph')
 async def generate_member_resources_graph(ctx, days: int = 30):
     """Generate and display a graph of member resources value over time."""
     try:
-        history_data = load_bank_history()
-        if "member_resources_records" not in history_data or not history_data["member_resources_records"]:
+        if not await ahas_member_resources_records():
             await ctx.send("❌ No member resources history data found. Wait for the hourly collection.")
             return
         
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        filtered_records = [r for r in history_data["member_resources_records"] if r["timestamp"].split()[0] >= cutoff_date]
+        filtered_records = await aload_member_resources_since(cutoff_date)
         
         if not filtered_records:
             await ctx.send(f"❌ No member resources history data found within the last {days} days.")
             return
         
-        dates = [datetime.strptime(r["timestamp"], '%Y-%m-%d %H:%M:%S') for r in filtered_records]
-        total_values = [r["total_value"] for r in filtered_records]
-        df = pd.DataFrame({'date': dates, 'total_value': total_values}).sort_values('date')
-        
-        plt.figure(figsize=(10, 6))
-        plt.plot(df['date'], df['total_value'], marker='o', linestyle='-', color='green')
-        plt.title(f'Alliance Member Resources Value Over Time (Last {days} days)')
-        plt.xlabel('Date')
-        plt.ylabel('Total Value ($)')
-        plt.grid(True, alpha=0.3)
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        temp_filename = 'member_resources_history_graph.png'
-        plt.savefig(temp_filename)
-        plt.close()
-        
-        await ctx.send(f"📊 Member resources value history graph (last {days} days):", file=discord.File(temp_filename))
-        os.remove(temp_filename)
+        df = pd.DataFrame(filtered_records, columns=['timestamp', 'total_value'])
+        df['date'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', cache=True)
+        df = df.sort_values('date')
+        
+        buf = await render_graph(
+            render_line_graph,
+            [(df['date'], df['total_value'], {'marker': 'o', 'linestyle': '-', 'color': 'green'})],
+            f'Alliance Member Resources Value Over Time (Last {days} days)',
+            'Total Value ($)'
+        )
+        
+        await ctx.send(f"📊 Member resources value history graph (last {days} days):", file=discord.File(buf, filename='member_resources_history_graph.png'))
     except Exception as e:
         await ctx.send(f"❌ An error occurred: {str(e)}")
         print(f"Error in generate_member_resources_graph: {e}")
 
-@bot.command(name='compare_bank_members')
-async def compare_bank_members_graph(ctx, days: int = 30):
-    """Generate a comparison graph of bank value and member resources value over time."""
-    try:
-        history_data = load_bank_history()
-        if not history_data["bank_records"] or not history_data.get("member_resources_records"):
-            await ctx.send("❌ Insufficient data for comparison. Ensure both bank and member resources data are available.")
-            return
-        
-        cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        bank_records = [r for r in history_data["bank_records"] if r["timestamp"].split()[0] >= cutoff_date]
-        member_records = [r for r in history_data.get("member_resources_records", []) if r["timestamp"].split()[0] >= cutoff_date]
-        
-        if not bank_records or not member_records:
-            await ctx.send(f"❌ Insufficient data within the last {days} days for comparison.")
-            return
-        
-        bank_dates = [datetime.strptime(r["timestamp"], '%Y-%m-%d %H:%M:%S') for r in bank_records]
-        bank_values = [r["resources"]["total_value"] for r in bank_records]
-        member_dates = [datetime.strptime(r["timestamp"], '%Y-%m-%d %H:%M:%S') for r in member_records]
-        member_values = [r["total_value"] for r in member_records]
-        
-        plt.figure(figsize=(12, 6))
-        plt.plot(bank_dates, bank_values, marker='o', linestyle='-', color='blue', label='Bank Value')
-        plt.plot(member_dates, member_values, marker='o', linestyle='-', color='green', label='Member Resources Value')
-        plt.title(f'Bank Value vs Member Resources Value (Last {days} days)')
-        plt.xlabel('Date')
-        plt.ylabel('Value ($)')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        temp_filename = 'comparison_graph.png'
-        plt.savefig(temp_filename)
-        plt.close()
-        
-        await ctx.send(f"📊 Comparison graph (last {days} days):", file=discord.File(temp_filename))
-        os.remove(temp_filename)
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
-        print(f"Error in compare_bank_members_graph: {e}")
+@bot.command(name='compare_bank_members')
+async def compare_bank_members_graph(ctx, days: int = 30):
+    """Generate a comparison graph of bank value and member resources value over time."""
+    try:
+        history_data = await aload_bank_history()
+        if not history_data["bank_records"] or not await ahas_member_resources_records():
+            await ctx.send("❌ Insufficient data for comparison. Ensure both bank and member resources data are available.")
+            return
+        
+        cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        bank_records = bank_records_since(history_data, cutoff_date)
+        member_records = await aload_member_resources_since(cutoff_date)
+        
+        if not bank_records or not member_records:
+            await ctx.send(f"❌ Insufficient data within the last {days} days for comparison.")
+            return
+        
+        bank_dates = pd.to_datetime([r["timestamp"] for r in bank_records], format='%Y-%m-%d %H:%M:%S', cache=True)
+        bank_values = [r["resources"]["total_value"] for r in bank_records]
+        member_dates = pd.to_datetime([r["timestamp"] for r in member_records], format='%Y-%m-%d %H:%M:%S', cache=True)
+        member_values = [r["total_value"] for r in member_records]
+        
+        buf = await render_graph(
+            render_line_graph,
+            [
+                (bank_dates, bank_values, {'marker': 'o', 'linestyle': '-', 'color': 'blue', 'label': 'Bank Value'}),
+                (member_dates, member_values, {'marker': 'o', 'linestyle': '-', 'color': 'green', 'label': 'Member Resources Value'}),
+            ],
+            f'Bank Value vs Member Resources Value (Last {days} days)',
+            'Value ($)',
+            figsize=(12, 6),
+            legend=True
+        )
+        
+        await ctx.send(f"📊 Comparison graph (last {days} days):", file=discord.File(buf, filename='comparison_graph.png'))
+    except Exception as e:
+        await ctx.send(f"❌ An error occurred: {str(e)}")
+        print(f"Error in compare_bank_members_graph: {e}")
+
+# Bank records are kept sorted on this key so they can be searched with bisect
+_record_timestamp = operator.itemgetter("timestamp")
+
+# Last bank history loaded or saved, keyed by the files' (mtime, size) so external edits are picked up
+_bank_history_cache = {"stamp": None, "data": None}
+
+def _file_stamp(path):
+    """Return the (mtime_ns, size) pair identifying a file's contents, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _bank_history_stamp():
+    """Return the stamps of the bank history settings file and records log."""
+    return (_file_stamp(BANK_HISTORY_FILE), _file_stamp(BANK_RECORDS_FILE))
+
+def _read_bank_records():
+    """Read every record of the bank records log, skipping corrupted lines."""
+    if not os.path.exists(BANK_RECORDS_FILE):
+        return []
+    with open(BANK_RECORDS_FILE, 'rb') as f:
+        lines = [line for line in f.read().split(b"\n") if line.strip()]
+    
+    # Fast path: the whole log parsed as one JSON array, in a single orjson call
+    try:
+        records = orjson.loads(b"[" + b",".join(lines) + b"]")
+        if len(records) == len(lines) and all(isinstance(record, dict) for record in records):
+            return records
+    except orjson.JSONDecodeError:
+        pass
+    
+    # A corrupted line breaks the array: parse line by line to skip only the bad ones
+    records = []
+    for line in lines:
+        try:
+            records.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            print(f"Skipping corrupted line in {BANK_RECORDS_FILE}")
+    return records
+
+def load_bank_history():
+    """Load the bank history data from file.
+    
+    Settings come from BANK_HISTORY_FILE and records from the BANK_RECORDS_FILE log.
+    The parsed data is kept in memory and only re-read when either file changes on disk.
+    The same dict is returned to every caller: anything that modifies it must save it.
+    """
+    stamp = _bank_history_stamp()
+    if stamp == (None, None):
+        return {"bank_records": []}
+    if stamp == _bank_history_cache["stamp"]:
+        return _bank_history_cache["data"]
+    
+    data = {}
+    if stamp[0] is not None:
+        try:
+            with open(BANK_HISTORY_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+        except orjson.JSONDecodeError:
+            print(f"Error: Could not decode {BANK_HISTORY_FILE}, creating new history data")
+            data = {}
+    
+    # Records still stored in the settings file (before migration) are merged with the log
+    records = data.pop("bank_records", [])
+    records.extend(_read_bank_records())
+    # Older files may hold out-of-order records; sorting an already sorted list is linear
+    records.sort(key=_record_timestamp)
+    data["bank_records"] = records
+    
+    _bank_history_cache.update(stamp=stamp, data=data)
+    return data
+
+def is_valid_tars_response(message):
+    """Determine if a message is a valid TARS response based on embed title and content."""
+    # Cheapest checks first: this runs for every message seen while waiting for TARS
+    if message.author.name != "TARS" or not message.embeds:
+        return False
+    title = message.embeds[0].title
+    if not title:  # No title in embed
+        return False
+    # Must have "success" in title and no "emptying" in title or content
+    title = title.casefold()
+    if "success" not in title or "emptying" in title:
+        return False
+    return "emptying" not in message.content.casefold()
+
+def save_bank_history(history_data):
+    """Save the bank history data to file, rewriting the settings file and the whole records log."""
+    settings = {key: value for key, value in history_data.items() if key != "bank_records"}
+    with open(BANK_HISTORY_FILE, 'wb') as f:
+        f.write(orjson.dumps(settings, option=HISTORY_JSON_OPTIONS))
+    with open(BANK_RECORDS_FILE, 'wb') as f:
+        f.write(b"".join(orjson.dumps(record) + b"\n" for record in history_data["bank_records"]))
+    _bank_history_cache.update(stamp=_bank_history_stamp(), data=history_data)
+
+def save_new_bank_record(history_data, bank_record):
+    """Add a bank record to the history and persist it.
+    
+    A record newer than every stored one (the usual $get_bank case) is appended to
+    the log in constant time; an older one goes through a full save to stay in order.
+    """
+    records = history_data["bank_records"]
+    if records and bank_record["timestamp"] < records[-1]["timestamp"]:
+        insert_bank_record(history_data, bank_record)
+        save_bank_history(history_data)
+        return
+    records.append(bank_record)
+    with open(BANK_RECORDS_FILE, 'ab') as f:
+        f.write(orjson.dumps(bank_record) + b"\n")
+    _bank_history_cache.update(stamp=_bank_history_stamp(), data=history_data)
+
+# Serialises load-modify-save sequences now that the file I/O yields to the event loop
+bank_history_lock = asyncio.Lock()
+
+async def aload_bank_history():
+    """Load the bank history in a worker thread so the event loop is not blocked."""
+    return await asyncio.to_thread(load_bank_history)
+
+async def asave_bank_history(history_data):
+    """Save the bank history in a worker thread so the event loop is not blocked."""
+    await asyncio.to_thread(save_bank_history, history_data)
+
+async def asave_new_bank_record(history_data, bank_record):
+    """Persist a new bank record in a worker thread so the event loop is not blocked."""
+    await asyncio.to_thread(save_new_bank_record, history_data, bank_record)
+
+def migrate_bank_records():
+    """Move bank records still stored in the bank history file to the JSONL log."""
+    if os.path.exists(BANK_RECORDS_FILE):
+        return
+    history_data = load_bank_history()
+    save_bank_history(history_data)
+    print(f"Moved {len(history_data['bank_records'])} bank records to {BANK_RECORDS_FILE}")
+
+def migrate_member_resources_records():
+    """Move member resources records still stored in the bank history file to the JSONL log."""
+    history_data = load_bank_history()
+    records = history_data.pop("member_resources_records", None)
+    if records is None:
+        return
+    with open(MEMBER_RESOURCES_FILE, 'ab') as f:
+        for record in records:
+            f.write(orjson.dumps(record) + b"\n")
+    save_bank_history(history_data)
+    print(f"Moved {len(records)} member resources records to {MEMBER_RESOURCES_FILE}")
+
+def append_member_resources_record(record):
+    """Append one member resources record to the JSONL log in constant time."""
+    with open(MEMBER_RESOURCES_FILE, 'ab') as f:
+        f.write(orjson.dumps(record) + b"\n")
+
+def has_member_resources_records():
+    """Return True if the member resources log holds at least one record."""
+    return os.path.exists(MEMBER_RESOURCES_FILE) and os.path.getsize(MEMBER_RESOURCES_FILE) > 0
+
+def load_member_resources_since(cutoff_date):
+    """Return the member resources records dated on or after cutoff_date ('YYYY-MM-DD'), oldest first."""
+    return list(iter_records_since(MEMBER_RESOURCES_FILE, cutoff_date))[::-1]
+
+async def aappend_member_resources_record(record):
+    """Append a member resources record in a worker thread so the event loop is not blocked."""
+    await asyncio.to_thread(append_member_resources_record, record)
+
+async def ahas_member_resources_records():
+    """Check the member resources log in a worker thread so the event loop is not blocked."""
+    return await asyncio.to_thread(has_member_resources_records)
+
+async def aload_member_resources_since(cutoff_date):
+    """Read the recent member resources records in a worker thread so the event loop is not blocked."""
+    return await asyncio.to_thread(load_member_resources_since, cutoff_date)
+
+def iter_records_since(path, cutoff_date, chunk_size=64 * 1024):
+    """
+    Yield the records of a JSONL log newest first, stopping at the first one older than cutoff_date.
+    
+    The file is read backwards in chunks, so only the tail covering the requested
+    period is read and parsed, however long the log has grown.
+    
+    Args:
+        path (str): Path of the JSONL file (records appended in chronological order)
+        cutoff_date (str): Oldest date to include, as YYYY-MM-DD
+        chunk_size (int): Number of bytes read per step
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # The first line may continue in the previous chunk, keep it for the next step
+            remainder = lines.pop(0) if position > 0 else b""
+            for line in reversed(lines):
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    print(f"Skipping corrupted line in {path}")
+                    continue
+                # A full timestamp never sorts before its own date: no need to split it
+                if record["timestamp"] < cutoff_date:
+                    return
+                yield record
+
+# TARS response patterns, compiled once at import
+TARS_RESOURCE_NAMES = ("food", "coal", "oil", "uranium", "lead", "iron", "bauxite", "gasoline", "munitions", "steel", "aluminum")
+TARS_CONTENT_MONEY_RE = re.compile(r'Money\s+\$([0-9,]+\.[0-9]+)')
+TARS_TOTAL_VALUE_RE = re.compile(r'Total Value\s+\$([0-9,]+\.[0-9]+)')
 
-def load_bank_history():
-    """Load the bank history data from file."""
-    if os.path.exists(BANK_HISTORY_FILE):
-        try:
-            with open(BANK_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode {BANK_HISTORY_FILE}, creating new history data")
-            return {"bank_records": []}
-    return {"bank_records": []}
+# Plain-text fallback: one alternation, each named group capturing the amount for its resource key
+TARS_CONTENT_RE = re.compile('|'.join([
+    r'Money\s+\$?(?P<money>[0-9,]+\.[0-9]+)',
+    *(rf'{resource.capitalize()}\s+(?P<{resource}>[0-9,]+\.[0-9]+)' for resource in TARS_RESOURCE_NAMES),
+    r'Total Value\s+\$(?P<total_value>[0-9,]+\.[0-9]+)',
+]))
 
-def is_valid_tars_response(message):
-    """Determine if a message is a valid TARS response based on embed title and content."""
-    if message.author.name != "TARS":
-        return False
-    if not message.embeds:  # No embed present
-        return False
-    embed = message.embeds[0]
-    if not embed.title:  # No title in embed
-        return False
-    title_lower = embed.title.lower()
-    content_lower = message.content.lower()
-    # Must have "success" in title and no "emptying" in title or content
-    if "success" not in title_lower or "emptying" in title_lower or "emptying" in content_lower:
-        return False
-    return True
+# Embed fields: (keyword in the field name, resource key, value pattern), checked in order
+_TARS_AMOUNT_RE = re.compile(r'([0-9,]+\.[0-9]+)')
+TARS_FIELD_PATTERNS = (
+    ("money", "money", re.compile(r'\$?([0-9,]+\.[0-9]+)')),
+    *((resource, resource, _TARS_AMOUNT_RE) for resource in TARS_RESOURCE_NAMES),
+    ("total value", "total_value", re.compile(r'\$([0-9,]+\.[0-9]+)')),
+    ("loan", "loan", re.compile(r'\$([0-9,]+)')),
+)
 
-def save_bank_history(history_data):
-    """Save the bank history data to file."""
-    with open(BANK_HISTORY_FILE, 'w') as f:
-        json.dump(history_data, f, indent=2)
+_THOUSANDS_SEPARATORS = str.maketrans('', '', ',')
+
+def parse_tars_number(text):
+    """Convert a TARS amount such as '1,773,250,299.94' to a float in a single translate pass."""
+    return float(text.translate(_THOUSANDS_SEPARATORS))
+
+@functools.lru_cache(maxsize=256)
+def tars_field_parser(field_name):
+    """Return the (resource, pattern) pair for a normalised embed field name, or None.
+    
+    TARS reuses the same field names on every response, so after the first message
+    each field is resolved by a single cache lookup instead of a keyword scan.
+    """
+    for keyword, resource, pattern in TARS_FIELD_PATTERNS:
+        if keyword in field_name:
+            return resource, pattern
+    return None
 
 async def extract_resources_from_tars_response(message_or_content):
     """Extract resource values from TARS bot response.
@@ -1515,133 +2204,65 @@ async def extract_resources_from_tars_response(message_or_content):
         content = message_or_content.content
         has_embeds = hasattr(message_or_content, 'embeds') and message_or_content.embeds
     
-    # First try to extract from message content directly
-    # Look for pattern like "$1,773,250,299.94" for total value
-    money_match = re.search(r'Money\s+\$([0-9,]+\.[0-9]+)', content)
-    if money_match:
-        try:
-            money = float(money_match.group(1).replace(',', ''))
-            resources['money'] = money
-        except ValueError:
-            pass
-            
     # Check for embeds if they exist
     if has_embeds and len(message_or_content.embeds) > 0:
         embed = message_or_content.embeds[0]
         
+        # First try to extract money from message content directly
+        # (without embeds the content scan below reads it anyway)
+        # Look for pattern like "$1,773,250,299.94"
+        money_match = TARS_CONTENT_MONEY_RE.search(content)
+        if money_match:
+            try:
+                money = parse_tars_number(money_match.group(1))
+                resources['money'] = money
+            except ValueError:
+                pass
+        
         # Extract from embed fields
         for field in embed.fields:
             # Process each field based on its name
             field_name = field.name.strip().lower() if field.name else ''
             field_value = field.value.strip() if field.value else ''
             
-            if "money" in field_name:
-                money_match = re.search(r'\$?([0-9,]+\.[0-9]+)', field_value)
-                if money_match:
-                    resources['money'] = float(money_match.group(1).replace(',', ''))
-            elif "food" in field_name:
-                food_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if food_match:
-                    resources['food'] = float(food_match.group(1).replace(',', ''))
-            elif "coal" in field_name:
-                coal_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if coal_match:
-                    resources['coal'] = float(coal_match.group(1).replace(',', ''))
-            elif "oil" in field_name:
-                oil_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if oil_match:
-                    resources['oil'] = float(oil_match.group(1).replace(',', ''))
-            elif "uranium" in field_name:
-                uranium_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if uranium_match:
-                    resources['uranium'] = float(uranium_match.group(1).replace(',', ''))
-            elif "lead" in field_name:
-                lead_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if lead_match:
-                    resources['lead'] = float(lead_match.group(1).replace(',', ''))
-            elif "iron" in field_name:
-                iron_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if iron_match:
-                    resources['iron'] = float(iron_match.group(1).replace(',', ''))
-            elif "bauxite" in field_name:
-                bauxite_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if bauxite_match:
-                    resources['bauxite'] = float(bauxite_match.group(1).replace(',', ''))
-            elif "gasoline" in field_name:
-                gasoline_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if gasoline_match:
-                    resources['gasoline'] = float(gasoline_match.group(1).replace(',', ''))
-            elif "munitions" in field_name:
-                munitions_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if munitions_match:
-                    resources['munitions'] = float(munitions_match.group(1).replace(',', ''))
-            elif "steel" in field_name:
-                steel_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if steel_match:
-                    resources['steel'] = float(steel_match.group(1).replace(',', ''))
-            elif "aluminum" in field_name:
-                aluminum_match = re.search(r'([0-9,]+\.[0-9]+)', field_value)
-                if aluminum_match:
-                    resources['aluminum'] = float(aluminum_match.group(1).replace(',', ''))
-            elif "total value" in field_name:
-                total_match = re.search(r'\$([0-9,]+\.[0-9]+)', field_value)
-                if total_match:
-                    resources['total_value'] = float(total_match.group(1).replace(',', ''))
-            elif "loan" in field_name:
-                loan_match = re.search(r'\$([0-9,]+)', field_value)
-                if loan_match:
-                    resources['loan'] = float(loan_match.group(1).replace(',', ''))
+            # The first keyword contained in the field name decides which resource it holds
+            parser = tars_field_parser(field_name)
+            if parser:
+                resource, pattern = parser
+                match = pattern.search(field_value)
+                if match:
+                    resources[resource] = parse_tars_number(match.group(1))
         
         # If we couldn't find total_value in fields, try to find it in the description or footer
         if 'total_value' not in resources and embed.description:
-            total_match = re.search(r'Total Value\s+\$([0-9,]+\.[0-9]+)', embed.description)
+            total_match = TARS_TOTAL_VALUE_RE.search(embed.description)
             if total_match:
-                resources['total_value'] = float(total_match.group(1).replace(',', ''))
+                resources['total_value'] = parse_tars_number(total_match.group(1))
         
         # Try footer text
         if 'total_value' not in resources and embed.footer:
             footer_text = embed.footer.text if embed.footer.text else ""
-            total_match = re.search(r'Total Value\s+\$([0-9,]+\.[0-9]+)', footer_text)
+            total_match = TARS_TOTAL_VALUE_RE.search(footer_text)
             if total_match:
-                resources['total_value'] = float(total_match.group(1).replace(',', ''))
+                resources['total_value'] = parse_tars_number(total_match.group(1))
                 
-    # If no data was found in embeds, or there are no embeds, try the regular content
-    if not resources or len(resources) <= 1:
-        # Extract money using regex
-        money_match = re.search(r'Money\s+\$?([0-9,]+\.[0-9]+)', content)
-        if money_match:
-            resources['money'] = float(money_match.group(1).replace(',', ''))
-        
-        # Extract other resources
-        patterns = {
-            'food': r'Food\s+([0-9,]+\.[0-9]+)',
-            'coal': r'Coal\s+([0-9,]+\.[0-9]+)',
-            'oil': r'Oil\s+([0-9,]+\.[0-9]+)',
-            'uranium': r'Uranium\s+([0-9,]+\.[0-9]+)',
-            'lead': r'Lead\s+([0-9,]+\.[0-9]+)',
-            'iron': r'Iron\s+([0-9,]+\.[0-9]+)',
-            'bauxite': r'Bauxite\s+([0-9,]+\.[0-9]+)',
-            'gasoline': r'Gasoline\s+([0-9,]+\.[0-9]+)',
-            'munitions': r'Munitions\s+([0-9,]+\.[0-9]+)',
-            'steel': r'Steel\s+([0-9,]+\.[0-9]+)',
-            'aluminum': r'Aluminum\s+([0-9,]+\.[0-9]+)',
-        }
-        
-        for resource, pattern in patterns.items():
-            match = re.search(pattern, content)
-            if match:
-                resources[resource] = float(match.group(1).replace(',', ''))
-        
-        # Extract total value
-        total_match = re.search(r'Total Value\s+\$([0-9,]+\.[0-9]+)', content)
-        if total_match:
-            resources['total_value'] = float(total_match.group(1).replace(',', ''))
-    
-    # Get current market prices
-    market_prices = await get_pnw_market_prices()
+    # If no data was found in embeds, or there are no embeds, try the regular content:
+    # an embed that gave more than the money line is complete and skips the content scan
+    embed_complete = len(resources) > 1
+    if not embed_complete:
+        # Extract money, other resources and total value in a single scan of the content,
+        # keeping the first occurrence of each like a separate search would
+        found = set()
+        for match in TARS_CONTENT_RE.finditer(content):
+            resource = match.lastgroup
+            if resource not in found:
+                found.add(resource)
+                resources[resource] = parse_tars_number(match.group(resource))
     
     # Calculate total value based on resources and market prices
+    # (prices are only needed when TARS did not report the total itself)
     if 'total_value' not in resources and resources:
+        market_prices = await get_pnw_market_prices()
         calculated_value = 0
         
         # Add money directly if available
@@ -1662,16 +2283,49 @@ async def extract_resources_from_tars_response(message_or_content):
     
     return resources
 
+def insert_bank_record(history_data, bank_record):
+    """Insert a bank record at its chronological position in the history."""
+    bisect.insort(history_data["bank_records"], bank_record, key=_record_timestamp)
+
+def parse_history_timestamp(timestamp):
+    """Parse a 'YYYY-MM-DD HH:MM:SS' history timestamp with the C ISO parser instead of strptime."""
+    return datetime.fromisoformat(timestamp)
+
+def bank_records_since(history_data, cutoff_date):
+    """Return the bank records dated on or after cutoff_date ('YYYY-MM-DD'), oldest first.
+    
+    A full timestamp never sorts before its own date, so a bisect on the sorted
+    records gives the same result as comparing each record's date to the cutoff.
+    """
+    records = history_data.get("bank_records", [])
+    return records[bisect.bisect_left(records, cutoff_date, key=_record_timestamp):]
+
+def to_cents(amount):
+    """Round a dollar amount to whole cents, so equal values compare equal despite float noise."""
+    return round(amount * 100)
+
+def format_money(amount):
+    """Format a dollar amount for display, e.g. 1234.5 -> '$1,234.50'."""
+    return f"${amount:,.2f}"
+
 def is_duplicate_entry(history_data, timestamp, total_value):
     """Check if this exact bank data has already been recorded."""
-    for record in history_data["bank_records"]:
-        # Check if we already have an entry with the same timestamp or same total value within a short time window
-        record_time = datetime.strptime(record["timestamp"], '%Y-%m-%d %H:%M:%S')
-        current_time = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-        time_diff = abs((record_time - current_time).total_seconds())
-        
-        # If entry exists within 5 minutes with the same value, consider it a duplicate
-        if time_diff < 300 and record["resources"].get("total_value") == total_value:
+    records = history_data["bank_records"]
+    total_cents = to_cents(total_value)
+    
+    # Timestamps are zero-padded 'YYYY-MM-DD HH:MM:SS' strings, so string order is time order:
+    # only the records less than 5 minutes away need to be looked at
+    current_time = parse_history_timestamp(timestamp)
+    window_start = (current_time - timedelta(seconds=299)).strftime('%Y-%m-%d %H:%M:%S')
+    window_end = (current_time + timedelta(seconds=299)).strftime('%Y-%m-%d %H:%M:%S')
+    
+    # If entry exists within 5 minutes with the same value, consider it a duplicate
+    for i in range(bisect.bisect_left(records, window_start, key=_record_timestamp), len(records)):
+        record = records[i]
+        if record["timestamp"] > window_end:
+            break
+        record_value = record["resources"].get("total_value")
+        if record_value is not None and to_cents(record_value) == total_cents:
             return True
     
     return False
@@ -1694,7 +2348,7 @@ async def on_message(message):
             # Updated check_tars_response function
             def check_tars_response(response):
                 """Check if the response is a valid TARS response in the same channel."""
-                return is_valid_tars_response(response) and response.channel == message.channel
+                return response.channel == message.channel and is_valid_tars_response(response)
             
             try:
                 # Wait for TARS to respond (timeout after 5 seconds)
@@ -1707,27 +2361,25 @@ async def on_message(message):
                 resources = await extract_resources_from_tars_response(tars_response)
                 
                 if resources and 'total_value' in resources:
-                    # Load existing history data
-                    history_data = load_bank_history()
-                    
-                    # Check if this is a duplicate entry
-                    if not is_duplicate_entry(history_data, timestamp, resources['total_value']):
-                        # Create record with metadata
-                        bank_record = {
-                            "timestamp": timestamp,
-                            "requested_by": message.author.name,
-                            "resources": resources
-                        }
-                        
-                        # Add the new record
-                        history_data["bank_records"].append(bank_record)
-                        
-                        # Save updated history
-                        save_bank_history(history_data)
+                    async with bank_history_lock:
+                        # Load existing history data
+                        history_data = await aload_bank_history()
                         
-                        print(f"Recorded new bank data: Total Value ${resources['total_value']:,.2f}")
-                    else:
-                        print(f"Skipped duplicate bank data entry")
+                        # Check if this is a duplicate entry
+                        if not is_duplicate_entry(history_data, timestamp, resources['total_value']):
+                            # Create record with metadata
+                            bank_record = {
+                                "timestamp": timestamp,
+                                "requested_by": message.author.name,
+                                "resources": resources
+                            }
+                            
+                            # Add the new record and append it to the log
+                            await asave_new_bank_record(history_data, bank_record)
+                            
+                            print(f"Recorded new bank data: Total Value ${resources['total_value']:,.2f}")
+                        else:
+                            print(f"Skipped duplicate bank data entry")
             
             except asyncio.TimeoutError:
                 print("Timeout waiting for TARS response")
@@ -1743,21 +2395,22 @@ async def remove_outliers(ctx):
     Supprime les enregistrements bancaires dont la valeur totale est inférieure à 500 millions.
     """
     try:
-        # Charger les données de l'historique bancaire
-        history_data = load_bank_history()
-        original_count = len(history_data["bank_records"])
-        
-        # Filtrer les enregistrements pour supprimer les outliers
-        history_data["bank_records"] = [
-            record for record in history_data["bank_records"]
-            if "total_value" in record["resources"] and record["resources"]["total_value"] >= 500000000.0
-        ]
-        
-        # Calculer le nombre d'enregistrements supprimés
-        removed_count = original_count - len(history_data["bank_records"])
-        
-        # Sauvegarder les modifications
-        save_bank_history(history_data)
+        async with bank_history_lock:
+            # Charger les données de l'historique bancaire
+            history_data = await aload_bank_history()
+            original_count = len(history_data["bank_records"])
+            
+            # Filtrer les enregistrements pour supprimer les outliers
+            history_data["bank_records"] = [
+                record for record in history_data["bank_records"]
+                if "total_value" in record["resources"] and record["resources"]["total_value"] >= 500000000.0
+            ]
+            
+            # Calculer le nombre d'enregistrements supprimés
+            removed_count = original_count - len(history_data["bank_records"])
+            
+            # Sauvegarder les modifications
+            await asave_bank_history(history_data)
         
         # Envoyer un message à l'utilisateur
         if removed_count > 0:
@@ -1767,6 +2420,38 @@ async def remove_outliers(ctx):
     except Exception as e:
         await ctx.send(f"Une erreur s'est produite lors de la suppression des outliers : {str(e)}")
 
+# Longueur maximale d'un message Discord
+DISCORD_MESSAGE_LIMIT = 2000
+
+def pack_message_sections(sections, limit=DISCORD_MESSAGE_LIMIT):
+    """
+    Regroupe des sections de texte en le moins de messages Discord possible.
+    
+    Les sections sont jointes par des retours à la ligne sans jamais être coupées,
+    sauf si une section dépasse à elle seule la limite.
+    
+    Args:
+        sections (list): Sections de texte, dans l'ordre d'envoi
+        limit (int): Longueur maximale d'un message
+        
+    Returns:
+        list: Messages à envoyer
+    """
+    messages = []
+    current = ""
+    for section in sections:
+        for start in range(0, max(len(section), 1), limit):
+            piece = section[start:start + limit]
+            if current and len(current) + 1 + len(piece) <= limit:
+                current += "\n" + piece
+            else:
+                if current:
+                    messages.append(current)
+                current = piece
+    if current:
+        messages.append(current)
+    return messages
+
 @bot.command(name='dump_raw_tars')
 async def dump_raw_tars(ctx, days: int = 1):
     """Dumps raw TARS message content to help debug extraction issues.
@@ -1781,48 +2466,55 @@ async def dump_raw_tars(ctx, days: int = 1):
         
         await ctx.send(f"🔍 Looking for TARS messages in the last {days} days...")
         
-        found_tars = 0
+        # Collect the TARS messages first (limit to 5 messages to avoid spam)
+        tars_messages = []
         async for message in channel.history(limit=100, after=cutoff_date):
             if message.author.name == "TARS":
-                found_tars += 1
-                
-                await ctx.send(f"TARS message #{found_tars}:")
-                
-                # Print basic message info
-                message_info = (
-                    f"Content: {message.content}\n"
-                    f"Has embeds: {len(message.embeds) > 0}\n"
-                    f"Created at: {message.created_at}"
-                )
-                await ctx.send(f"```{message_info}```")
-                
-                # Try to extract using our function
-                resources = await extract_resources_from_tars_response(message)
-                if resources:
-                    await ctx.send(f"Extracted resources: {resources}")
-                else:
-                    await ctx.send("Failed to extract any resources from this message")
-                
-                # If it has embeds, show more details
-                if message.embeds:
-                    embed_info = []
-                    for i, embed in enumerate(message.embeds):
-                        embed_info.append(f"Embed #{i+1}:")
-                        embed_info.append(f"  Title: {embed.title}")
-                        embed_info.append(f"  Description: {embed.description}")
-                        
-                        if embed.fields:
-                            embed_info.append("  Fields:")
-                            for j, field in enumerate(embed.fields):
-                                embed_info.append(f"    Field #{j+1}: {field.name} = {field.value}")
+                tars_messages.append(message)
+                if len(tars_messages) >= 5:
+                    break
+        found_tars = len(tars_messages)
+        
+        # Try to extract using our function, for all messages concurrently
+        extractions = await asyncio.gather(*(extract_resources_from_tars_response(message) for message in tars_messages))
+        
+        for number, (message, resources) in enumerate(zip(tars_messages, extractions), 1):
+            # Collect the whole report for this message, sent in as few messages as possible
+            report = [f"TARS message #{number}:"]
+            
+            # Print basic message info
+            message_info = (
+                f"Content: {message.content}\n"
+                f"Has embeds: {len(message.embeds) > 0}\n"
+                f"Created at: {message.created_at}"
+            )
+            report.append(f"```{message_info}```")
+            
+            if resources:
+                report.append(f"Extracted resources: {resources}")
+            else:
+                report.append("Failed to extract any resources from this message")
+            
+            # If it has embeds, show more details
+            if message.embeds:
+                embed_info = []
+                for i, embed in enumerate(message.embeds):
+                    embed_info.append(f"Embed #{i+1}:")
+                    embed_info.append(f"  Title: {embed.title}")
+                    embed_info.append(f"  Description: {embed.description}")
                     
-                    # Fix: Use '\n' instead of 'newline'
-                    await ctx.send(f"```{'newline'.join(embed_info)}```")
+                    if embed.fields:
+                        embed_info.append("  Fields:")
+                        for j, field in enumerate(embed.fields):
+                            embed_info.append(f"    Field #{j+1}: {field.name} = {field.value}")
                 
-                await ctx.send("-----------------------------------")
-                
-                if found_tars >= 5:  # Limit to 5 messages to avoid spam
-                    break
+                embed_text = '\n'.join(embed_info)
+                report.append(f"```{embed_text}```")
+            
+            report.append("-----------------------------------")
+            
+            for chunk in pack_message_sections(report):
+                await ctx.send(chunk)
         
         if found_tars == 0:
             await ctx.send("No TARS messages found in the time period.")
@@ -1831,6 +2523,60 @@ async def dump_raw_tars(ctx, days: int = 1):
         await ctx.send(f"❌ An error occurred: {str(e)}")
         print(f"Error in dump_raw_tars: {e}")
 
+def scan_after(history_data, channel, cutoff_date):
+    """Return the point to scan a channel from.
+    
+    A scan resumes after the last message already scanned only if the channel was
+    already scanned back to cutoff_date or earlier; a scan asking for older history
+    starts again from its own cutoff (duplicates are skipped when recording).
+    """
+    channel_key = str(channel.id)
+    cutoff_id = discord.utils.time_snowflake(cutoff_date)
+    scanned_since = history_data.get("scanned_since_ids", {}).get(channel_key)
+    if scanned_since is None or scanned_since > cutoff_id:
+        return discord.Object(id=cutoff_id)
+    last_id = history_data.get("last_scanned_ids", {}).get(channel_key, 0)
+    return discord.Object(id=max(last_id, cutoff_id))
+
+def record_scanned(history_data, channel, last_id, cutoff_date):
+    """Remember how far back and up to which message a channel has been fully scanned."""
+    channel_key = str(channel.id)
+    # The scan covered everything from its start point to now, so the oldest covered cutoff can only move back
+    since = history_data.setdefault("scanned_since_ids", {})
+    cutoff_id = discord.utils.time_snowflake(cutoff_date)
+    since[channel_key] = min(cutoff_id, since.get(channel_key, cutoff_id))
+    if last_id:
+        scanned = history_data.setdefault("last_scanned_ids", {})
+        scanned[channel_key] = max(last_id, scanned.get(channel_key, 0))
+
+async def merge_scanned_bank_records(scanned_records, scanned_channels):
+    """
+    Add the records found by a history scan to the bank history and save it, under bank_history_lock.
+    
+    Scans collect their records in a local list while they read channel history; nothing
+    touches the shared history until this single locked step, so a scan never interleaves
+    with the $get_bank append path and a failed scan leaves no unsaved changes behind.
+    
+    Args:
+        scanned_records (list): Bank records found by the scan
+        scanned_channels (list): (channel, last_id, cutoff_date) for each channel scanned to the end
+        
+    Returns:
+        tuple: (history_data, number of records actually added)
+    """
+    async with bank_history_lock:
+        history_data = await aload_bank_history()
+        added = 0
+        for bank_record in scanned_records:
+            # Checked again here: other records may have been added since the scan saw the history
+            if not is_duplicate_entry(history_data, bank_record["timestamp"], bank_record["resources"]["total_value"]):
+                insert_bank_record(history_data, bank_record)
+                added += 1
+        for channel, last_id, cutoff_date in scanned_channels:
+            record_scanned(history_data, channel, last_id, cutoff_date)
+        await asave_bank_history(history_data)
+    return history_data, added
+
 @bot.command(name='scan_history')
 async def scan_message_history(ctx, days: int = 30, channel_id: int = None):
     """
@@ -1855,8 +2601,9 @@ async def scan_message_history(ctx, days: int = 30, channel_id: int = None):
         
         await ctx.send(f"🔍 Starting to scan message history in {channel.name} for the past {days} days...")
         
-        # Load existing history data
-        history_data = load_bank_history()
+        # Load existing history data (only read during the scan: new records are collected locally)
+        history_data = await aload_bank_history()
+        scanned_records = []
         
         # Initialize counters
         commands_found = 0
@@ -1865,8 +2612,12 @@ async def scan_message_history(ctx, days: int = 30, channel_id: int = None):
         # Create a progress message that we'll update
         progress_msg = await ctx.send("Scanning messages: 0 commands found, 0 responses parsed")
         
-        # Start scanning the message history
-        async for message in channel.history(limit=None, after=cutoff_date):
+        # Start scanning the message history, after the messages already scanned
+        last_id = 0
+        unanswered_id = None  # First command whose response window was still open when it was scanned
+        async for message in channel.history(limit=None, after=scan_after(history_data, channel, cutoff_date)):
+            last_id = max(last_id, message.id)
+            
             # Skip messages from the bot itself
             if message.author == bot.user:
                 continue
@@ -1898,8 +2649,8 @@ async def scan_message_history(ctx, days: int = 30, channel_id: int = None):
                                     "resources": resources
                                 }
                                 
-                                # Add the new record
-                                history_data["bank_records"].append(bank_record)
+                                # Keep the new record for the merge at the end of the scan
+                                scanned_records.append(bank_record)
                                 responses_parsed += 1
                         
                         # Update progress every 5 found commands
@@ -1908,33 +2659,36 @@ async def scan_message_history(ctx, days: int = 30, channel_id: int = None):
                         
                         # We found the TARS response for this command, so we can break the inner loop
                         break
+                else:
+                    # No response yet, but it may still come: the next scan must see this command again
+                    if unanswered_id is None and before_limit > discord.utils.utcnow():
+                        unanswered_id = message.id
         
-        # Sort records by timestamp to ensure chronological order
-        history_data["bank_records"].sort(key=lambda x: x["timestamp"])
+        if unanswered_id is not None:
+            last_id = unanswered_id - 1
         
-        # Save the updated history data
-        save_bank_history(history_data)
+        # Merge and save the new records, with where the next scan of this channel starts
+        history_data, records_added = await merge_scanned_bank_records(scanned_records, [(channel, last_id, cutoff_date)])
         
         # Send final results
         await progress_msg.edit(content=f"✅ Scan complete! Found {commands_found} '$get_bank' commands and parsed {responses_parsed} TARS responses.")
         
         # If we found some data, show a summary
-        if responses_parsed > 0:
+        if records_added > 0:
             # Create a summary embed
             embed = discord.Embed(
                 title="Historical Bank Data Scan Results",
-                description=f"Successfully retrieved {responses_parsed} historical bank records",
+                description=f"Successfully retrieved {records_added} historical bank records",
                 color=discord.Color.green()
             )
             
-            # Get earliest and latest dates
-            sorted_records = sorted(history_data["bank_records"], key=lambda x: x["timestamp"])
-            earliest = datetime.strptime(sorted_records[0]["timestamp"], '%Y-%m-%d %H:%M:%S')
-            latest = datetime.strptime(sorted_records[-1]["timestamp"], '%Y-%m-%d %H:%M:%S')
+            # Get earliest and latest dates (records are kept in chronological order)
+            earliest = history_data["bank_records"][0]["timestamp"][:10]
+            latest = history_data["bank_records"][-1]["timestamp"][:10]
             
             embed.add_field(
                 name="📅 Date Range", 
-                value=f"From {earliest.strftime('%Y-%m-%d')} to {latest.strftime('%Y-%m-%d')}", 
+                value=f"From {earliest} to {latest}", 
                 inline=False
             )
             
@@ -1967,7 +2721,7 @@ async def show_bank_history(ctx, days: int = 7):
     """
     try:
         # Load bank history
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         
         if not history_data["bank_records"]:
             await ctx.send("❌ No bank history data found. Wait for users to use $get_bank.")
@@ -1977,10 +2731,7 @@ async def show_bank_history(ctx, days: int = 7):
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
         # Filter records to those within the time range
-        filtered_records = [
-            record for record in history_data["bank_records"]
-            if record["timestamp"].split()[0] >= cutoff_date
-        ]
+        filtered_records = bank_records_since(history_data, cutoff_date)
         
         if not filtered_records:
             await ctx.send(f"❌ No bank history data found within the last {days} days.")
@@ -2011,7 +2762,7 @@ async def show_bank_history(ctx, days: int = 7):
         
         embed.add_field(
             name="💰 Total Value", 
-            value=f"${newest_value:,.2f}", 
+            value=format_money(newest_value), 
             inline=True
         )
         
@@ -2049,7 +2800,7 @@ async def generate_bank_graph(ctx, days: int = 30):
     """
     try:
         # Load bank history
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         
         if not history_data["bank_records"]:
             await ctx.send("❌ No bank history data found. Wait for users to use $get_bank.")
@@ -2059,55 +2810,27 @@ async def generate_bank_graph(ctx, days: int = 30):
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
         # Filter records to those within the time range
-        filtered_records = [
-            record for record in history_data["bank_records"]
-            if record["timestamp"].split()[0] >= cutoff_date
-        ]
+        filtered_records = bank_records_since(history_data, cutoff_date)
         
         if not filtered_records:
             await ctx.send(f"❌ No bank history data found within the last {days} days.")
             return
             
-        # Extract data for plotting
-        dates = [datetime.strptime(record["timestamp"], '%Y-%m-%d %H:%M:%S') for record in filtered_records]
-        total_values = [record["resources"]["total_value"] for record in filtered_records]
-        
-        # Create a DataFrame for easier manipulation
-        df = pd.DataFrame({
-            'date': dates,
-            'total_value': total_values
-        })
-        
-        # Sort by date to ensure chronological order
-        df = df.sort_values('date')
-        
-        # Create the plot
-        plt.figure(figsize=(10, 6))
-        plt.plot(df['date'], df['total_value'], marker='o', linestyle='-', color='blue')
-        plt.title(f'Alliance Bank Value Over Time (Last {days} days)')
-        plt.xlabel('Date')
-        plt.ylabel('Total Value ($)')
-        plt.grid(True, alpha=0.3)
-        
-        # Format y-axis with commas for thousands
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        
-        # Rotate x-axis labels for better readability
-        plt.xticks(rotation=45)
-        
-        # Tight layout to ensure everything fits
-        plt.tight_layout()
-        
-        # Save the plot to a temporary file
-        temp_filename = 'bank_history_graph.png'
-        plt.savefig(temp_filename)
-        plt.close()
+        # Build the plotting frame straight from the records (already in chronological order)
+        df = pd.DataFrame(filtered_records, columns=['timestamp', 'resources'])
+        df['date'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', cache=True)
+        df['total_value'] = df['resources'].map(operator.itemgetter('total_value'))
+        
+        # Render the plot off the event loop
+        buf = await render_graph(
+            render_line_graph,
+            [(df['date'], df['total_value'], {'marker': 'o', 'linestyle': '-', 'color': 'blue'})],
+            f'Alliance Bank Value Over Time (Last {days} days)',
+            'Total Value ($)'
+        )
         
         # Send the graph image
-        await ctx.send(f"📊 Bank value history graph (last {days} days):", file=discord.File(temp_filename))
-        
-        # Clean up the temporary file
-        os.remove(temp_filename)
+        await ctx.send(f"📊 Bank value history graph (last {days} days):", file=discord.File(buf, filename='bank_history_graph.png'))
         
     except Exception as e:
         await ctx.send(f"❌ An error occurred: {str(e)}")
@@ -2124,7 +2847,7 @@ async def show_bank_stats(ctx, days: int = 30):
     """
     try:
         # Load bank history
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         
         if not history_data["bank_records"]:
             await ctx.send("❌ No bank history data found. Wait for users to use $get_bank.")
@@ -2134,36 +2857,34 @@ async def show_bank_stats(ctx, days: int = 30):
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
         # Filter records to those within the time range
-        filtered_records = [
-            record for record in history_data["bank_records"]
-            if record["timestamp"].split()[0] >= cutoff_date
-        ]
+        filtered_records = bank_records_since(history_data, cutoff_date)
         
         if not filtered_records:
             await ctx.send(f"❌ No bank history data found within the last {days} days.")
             return
         
-        # Sort records by timestamp
-        filtered_records.sort(key=lambda x: x["timestamp"])
-        
         # Extract total values for stats calculation
-        total_values = [record["resources"]["total_value"] for record in filtered_records]
+        total_values = np.fromiter(
+            (record["resources"]["total_value"] for record in filtered_records),
+            dtype=np.float64,
+            count=len(filtered_records)
+        )
         
         # Calculate statistics
         if len(total_values) >= 2:
-            earliest_value = total_values[0]
-            latest_value = total_values[-1]
-            min_value = min(total_values)
-            max_value = max(total_values)
-            avg_value = sum(total_values) / len(total_values)
+            earliest_value = float(total_values[0])
+            latest_value = float(total_values[-1])
+            min_value = float(total_values.min())
+            max_value = float(total_values.max())
+            avg_value = float(total_values.mean())
             
             # Calculate overall growth
             growth = latest_value - earliest_value
             growth_percent = (growth / earliest_value) * 100 if earliest_value else 0
             
             # Calculate daily growth rate
-            start_date = datetime.strptime(filtered_records[0]["timestamp"], '%Y-%m-%d %H:%M:%S')
-            end_date = datetime.strptime(filtered_records[-1]["timestamp"], '%Y-%m-%d %H:%M:%S')
+            start_date = parse_history_timestamp(filtered_records[0]["timestamp"])
+            end_date = parse_history_timestamp(filtered_records[-1]["timestamp"])
             days_elapsed = max((end_date - start_date).days, 1)  # Ensure at least 1 day to avoid division by zero
             
             daily_growth = growth / days_elapsed
@@ -2178,8 +2899,8 @@ async def show_bank_stats(ctx, days: int = 30):
             
             # Add fields for statistics
             embed.add_field(name="📊 Date Range", value=f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", inline=False)
-            embed.add_field(name="💰 Starting Value", value=f"${earliest_value:,.2f}", inline=True)
-            embed.add_field(name="💰 Current Value", value=f"${latest_value:,.2f}", inline=True)
+            embed.add_field(name="💰 Starting Value", value=format_money(earliest_value), inline=True)
+            embed.add_field(name="💰 Current Value", value=format_money(latest_value), inline=True)
             
             growth_emoji = "📈" if growth >= 0 else "📉"
             embed.add_field(name=f"{growth_emoji} Total Growth", value=f"${growth:,.2f} ({growth_percent:.2f}%)", inline=False)
@@ -2187,9 +2908,9 @@ async def show_bank_stats(ctx, days: int = 30):
             daily_emoji = "📈" if daily_growth >= 0 else "📉"
             embed.add_field(name=f"{daily_emoji} Daily Growth", value=f"${daily_growth:,.2f} ({daily_growth_percent:.2f}%)", inline=True)
             
-            embed.add_field(name="📊 Minimum Value", value=f"${min_value:,.2f}", inline=True)
-            embed.add_field(name="📊 Maximum Value", value=f"${max_value:,.2f}", inline=True)
-            embed.add_field(name="📊 Average Value", value=f"${avg_value:,.2f}", inline=True)
+            embed.add_field(name="📊 Minimum Value", value=format_money(min_value), inline=True)
+            embed.add_field(name="📊 Maximum Value", value=format_money(max_value), inline=True)
+            embed.add_field(name="📊 Average Value", value=format_money(avg_value), inline=True)
             
             # Add footer
             embed.set_footer(text=f"Use !bank_graph to see a visualization | Retrieved at {ctx.message.created_at.strftime('%Y-%m-%d %H:%M:%S UTC')}")
@@ -2223,7 +2944,7 @@ async def show_resource_history(ctx, resource: str, days: int = 30):
             return
         
         # Load bank history
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         
         if not history_data["bank_records"]:
             await ctx.send("❌ No bank history data found. Wait for users to use $get_bank.")
@@ -2234,61 +2955,35 @@ async def show_resource_history(ctx, resource: str, days: int = 30):
         
         # Filter records to those within the time range and that have the resource
         filtered_records = [
-            record for record in history_data["bank_records"]
-            if record["timestamp"].split()[0] >= cutoff_date and
-            resource in record["resources"]
+            record for record in bank_records_since(history_data, cutoff_date)
+            if resource in record["resources"]
         ]
         
         if not filtered_records:
             await ctx.send(f"❌ No history data found for resource '{resource}' within the last {days} days.")
             return
             
-        # Extract data for plotting
-        dates = [datetime.strptime(record["timestamp"], '%Y-%m-%d %H:%M:%S') for record in filtered_records]
-        values = [record["resources"][resource] for record in filtered_records]
-        
-        # Create a DataFrame for easier manipulation
-        df = pd.DataFrame({
-            'date': dates,
-            'value': values
-        })
-        
-        # Sort by date to ensure chronological order
-        df = df.sort_values('date')
-        
-        # Create the plot
-        plt.figure(figsize=(10, 6))
-        plt.plot(df['date'], df['value'], marker='o', linestyle='-', color='green')
-        plt.title(f'Alliance {resource.capitalize()} Over Time (Last {days} days)')
-        plt.xlabel('Date')
+        # Build the plotting frame straight from the records (already in chronological order)
+        df = pd.DataFrame(filtered_records, columns=['timestamp', 'resources'])
+        df['date'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', cache=True)
+        df['value'] = df['resources'].map(operator.itemgetter(resource))
         
         # Set appropriate y-axis label based on resource
         if resource == "money" or resource == "total_value":
-            plt.ylabel(f'{resource.capitalize()} ($)')
+            ylabel = f'{resource.capitalize()} ($)'
         else:
-            plt.ylabel(f'{resource.capitalize()} (units)')
-        
-        plt.grid(True, alpha=0.3)
-        
-        # Format y-axis with commas for thousands
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        
-        # Rotate x-axis labels for better readability
-        plt.xticks(rotation=45)
-        
-        # Tight layout to ensure everything fits
-        plt.tight_layout()
-        
-        # Save the plot to a temporary file
-        temp_filename = f'{resource}_history_graph.png'
-        plt.savefig(temp_filename)
-        plt.close()
+            ylabel = f'{resource.capitalize()} (units)'
+        
+        # Render the plot off the event loop
+        buf = await render_graph(
+            render_line_graph,
+            [(df['date'], df['value'], {'marker': 'o', 'linestyle': '-', 'color': 'green'})],
+            f'Alliance {resource.capitalize()} Over Time (Last {days} days)',
+            ylabel
+        )
         
         # Send the graph image
-        await ctx.send(f"📊 {resource.capitalize()} history graph (last {days} days):", file=discord.File(temp_filename))
-        
-        # Clean up the temporary file
-        os.remove(temp_filename)
+        await ctx.send(f"📊 {resource.capitalize()} history graph (last {days} days):", file=discord.File(buf, filename=f'{resource}_history_graph.png'))
         
     except Exception as e:
         await ctx.send(f"❌ An error occurred: {str(e)}")
@@ -2316,8 +3011,10 @@ async def scan_all_channels(ctx, days: int = 30):
         # Create a progress message that we'll update
         progress_msg = await ctx.send("Starting scan...")
         
-        # Load existing history data
-        history_data = load_bank_history()
+        # Load existing history data (only read during the scan: new records are collected locally)
+        history_data = await aload_bank_history()
+        scanned_records = []
+        scanned_channels = []
         
         # Scan each channel
         for i, channel in enumerate(text_channels):
@@ -2330,8 +3027,46 @@ async def scan_all_channels(ctx, days: int = 30):
                 channel_commands = 0
                 channel_responses = 0
                 
-                # Scan the channel's message history
-                async for message in channel.history(limit=None, after=cutoff_date):
+                # Scan the channel's message history (oldest first), after the messages already scanned.
+                # A command's TARS response is picked up as the following messages come in this same
+                # iteration, instead of with a second history request per command
+                last_id = 0
+                pending_command = None  # Last $get_bank command still waiting for its response
+                pending_left = 0  # Messages following it that may still be the response
+                async for message in channel.history(limit=None, after=scan_after(history_data, channel, cutoff_date)):
+                    last_id = max(last_id, message.id)
+                    
+                    # Look for TARS response - among the 2 messages following the command, within 5 seconds
+                    if pending_command is not None:
+                        pending_left -= 1
+                        in_window = message.created_at - pending_command.created_at < timedelta(seconds=5)
+                        if in_window and is_valid_tars_response(message):
+                            # Extract timestamp from the command message
+                            timestamp = pending_command.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                            
+                            # Extract resources from TARS response
+                            resources = await extract_resources_from_tars_response(message)
+                            
+                            if resources and 'total_value' in resources:
+                                # Check if this is a duplicate entry
+                                if not is_duplicate_entry(history_data, timestamp, resources['total_value']):
+                                    # Create record with metadata
+                                    bank_record = {
+                                        "timestamp": timestamp,
+                                        "requested_by": pending_command.author.name,
+                                        "resources": resources,
+                                        "channel": channel.name
+                                    }
+                                    
+                                    # Keep the new record for the merge at the end of the scan
+                                    scanned_records.append(bank_record)
+                                    channel_responses += 1
+                            
+                            # We found the TARS response for this command
+                            pending_command = None
+                        elif not in_window or pending_left == 0:
+                            pending_command = None
+                    
                     # Skip messages from the bot itself
                     if message.author == bot.user:
                         continue
@@ -2339,41 +3074,16 @@ async def scan_all_channels(ctx, days: int = 30):
                     # Check if this is a $get_bank command
                     if message.content.strip().lower() == "$get_bank":
                         channel_commands += 1
-                        
-                        # Get messages after this command (limited search window)
-                        after_command = message.created_at
-                        before_limit = after_command + timedelta(seconds=5)  # 5 second window to find TARS response
-                        
-                        # Look for TARS response - take the immediately following message
-                        next_messages = [msg async for msg in channel.history(limit=2, after=after_command, before=before_limit)]
-                        for response in next_messages:
-                            if is_valid_tars_response(response):
-                                # Extract timestamp from the message
-                                timestamp = message.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                                
-                                # Extract resources from TARS response
-                                resources = await extract_resources_from_tars_response(response)
-                                
-                                if resources and 'total_value' in resources:
-                                    # Check if this is a duplicate entry
-                                    if not is_duplicate_entry(history_data, timestamp, resources['total_value']):
-                                        # Create record with metadata
-                                        bank_record = {
-                                            "timestamp": timestamp,
-                                            "requested_by": message.author.name,
-                                            "resources": resources,
-                                            "channel": channel.name
-                                        }
-                                        
-                                        # Add the new record
-                                        history_data["bank_records"].append(bank_record)
-                                        channel_responses += 1
-                                
-                                # We found the TARS response for this command, so we can break the inner loop
-                                break
+                        pending_command = message
+                        pending_left = 2
+                
+                # A command still waiting at the end may get its response later: the next scan restarts just before it
+                if pending_command is not None:
+                    last_id = pending_command.id - 1
                 
                 total_commands += channel_commands
                 total_responses += channel_responses
+                scanned_channels.append((channel, last_id, cutoff_date))
                 
                 # Update progress with this channel's results
                 await progress_msg.edit(content=f"Scanning channel {i+1}/{len(text_channels)}: {channel.name} - Found {channel_commands} commands, {channel_responses} responses")
@@ -2383,32 +3093,28 @@ async def scan_all_channels(ctx, days: int = 30):
             except Exception as e:
                 await ctx.send(f"⚠️ Error scanning #{channel.name}: {str(e)}")
         
-        # Sort records by timestamp to ensure chronological order
-        history_data["bank_records"].sort(key=lambda x: x["timestamp"])
-        
-        # Save the updated history data
-        save_bank_history(history_data)
+        # Merge and save the new records, with where the next scan of each fully scanned channel starts
+        history_data, records_added = await merge_scanned_bank_records(scanned_records, scanned_channels)
         
         # Send final results
         await progress_msg.edit(content=f"✅ Scan complete! Found {total_commands} '$get_bank' commands and parsed {total_responses} TARS responses across all channels.")
         
         # If we found some data, show a summary
-        if total_responses > 0:
+        if records_added > 0:
             # Create a summary embed
             embed = discord.Embed(
                 title="Server-wide Bank Data Scan Results",
-                description=f"Successfully retrieved {total_responses} historical bank records",
+                description=f"Successfully retrieved {records_added} historical bank records",
                 color=discord.Color.green()
             )
             
-            # Get earliest and latest dates
-            sorted_records = sorted(history_data["bank_records"], key=lambda x: x["timestamp"])
-            earliest = datetime.strptime(sorted_records[0]["timestamp"], '%Y-%m-%d %H:%M:%S')
-            latest = datetime.strptime(sorted_records[-1]["timestamp"], '%Y-%m-%d %H:%M:%S')
+            # Get earliest and latest dates (records are kept in chronological order)
+            earliest = history_data["bank_records"][0]["timestamp"][:10]
+            latest = history_data["bank_records"][-1]["timestamp"][:10]
             
             embed.add_field(
                 name="📅 Date Range", 
-                value=f"From {earliest.strftime('%Y-%m-%d')} to {latest.strftime('%Y-%m-%d')}", 
+                value=f"From {earliest} to {latest}", 
                 inline=False
             )
             
@@ -2448,26 +3154,16 @@ async def show_market_prices(ctx):
         for resource, price in market_prices.items():
             embed.add_field(
                 name=f"{resource.capitalize()}", 
-                value=f"${price:,.2f}", 
+                value=format_money(price), 
                 inline=True
             )
         
-        # Check if we're using cached prices or defaults
-        if os.path.exists(MARKET_PRICES_CACHE_FILE):
-            try:
-                with open(MARKET_PRICES_CACHE_FILE, 'r') as f:
-                    cache_data = json.load(f)
-                    cache_time = cache_data.get('timestamp', 0)
-                    cache_age = time.time() - cache_time
-                    
-                    if cache_age < 7200:  # 2 hours
-                        embed.set_footer(text=f"Using cached prices from {datetime.fromtimestamp(cache_time).strftime('%Y-%m-%d %H:%M:%S')}")
-                    else:
-                        embed.set_footer(text="Using fresh prices from P&W API")
-            except:
-                embed.set_footer(text="Using default prices (API unavailable)")
+        # Check if we're using cached prices or defaults: the in-process cache knows, no need to re-read the file
+        if _cached_market_prices() is not None:
+            cache_time = _prices_cache["timestamp"]
+            embed.set_footer(text=f"Using cached prices from {datetime.fromtimestamp(cache_time).strftime('%Y-%m-%d %H:%M:%S')}")
         else:
-            embed.set_footer(text="Using default prices (no cache available)")
+            embed.set_footer(text="Using default prices (API unavailable)")
         
         await ctx.send(embed=embed)
         
@@ -2479,7 +3175,7 @@ async def show_market_prices(ctx):
 async def collect_member_resources(ctx):
     """Manually collect and record member resources data for the set alliance."""
     # Load existing history data
-    history_data = load_bank_history()
+    history_data = await aload_bank_history()
     alliance_id = history_data.get("alliance_id")
     
     # Check if alliance ID is set
@@ -2504,17 +3200,34 @@ async def collect_member_resources(ctx):
         "total_value": aggregated_data["total_value"]
     }
     
-    # Ensure member_resources_records exists in history_data
-    if "member_resources_records" not in history_data:
-        history_data["member_resources_records"] = []
-    
-    # Add the new record and save
-    history_data["member_resources_records"].append(record)
-    save_bank_history(history_data)
+    # Append the new record to the member resources log
+    await aappend_member_resources_record(record)
     
     # Send confirmation with total value
     await ctx.send(f"✅ Member resources data collected: Total Value ${aggregated_data['total_value']:,.2f} at {timestamp}.")
 
+# Champs de revenu des embeds : (libellé, clé du revenu), dans l'ordre d'affichage
+NATION_INCOME_FIELDS = (
+    ("Revenu brut", "gross_income"),
+    ("Bonus de couleur", "color_bonus"),
+    ("Revenu brut total", "gross_total"),
+    ("Entretien militaire", "military_upkeep"),
+    ("Entretien des infrastructures", "improvement_upkeep"),
+    ("Dépenses totales", "gross_upkeep"),
+    ("Revenu net", "net_income"),
+    ("Revenu net avec ressources", "monetary_net_income"),
+)
+ALLIANCE_INCOME_FIELDS = (
+    ("💰 Revenus fiscaux", "gross_income"),
+    ("🎨 Bonus de couleur", "color_bonus"),
+    ("💵 Revenus bruts", "gross_total"),
+    ("⚔️ Dépenses militaires", "military_upkeep"),
+    ("🏙️ Dépenses d'infrastructure", "improvement_upkeep"),
+    ("💸 Dépenses totales", "gross_upkeep"),
+    ("📈 Revenus nets", "net_income"),
+    ("💎 Revenus totaux (avec ressources)", "monetary_net_income"),
+)
+
 @bot.command(name='revenue')
 async def revenue_command(ctx, nation_id: int):
     """
@@ -2552,62 +3265,16 @@ async def revenue_command(ctx, nation_id: int):
         # Ajouter la valeur monétaire totale
         embed.add_field(
             name="Valeur des ressources",
-            value=f"${result['total_monetary_value']:,.2f}",
+            value=format_money(result['total_monetary_value']),
             inline=True
         )
         
         # Ajouter les informations sur les revenus monétaires
         embed.add_field(name="Revenus", value=" ", inline=False)  # Séparateur
         
-        embed.add_field(
-            name="Revenu brut",
-            value=f"${result['income']['gross_income']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="Bonus de couleur",
-            value=f"${result['income']['color_bonus']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="Revenu brut total",
-            value=f"${result['income']['gross_total']:,.2f}",
-            inline=True
-        )
-        
-        # Ajouter les informations sur les dépenses
-        embed.add_field(
-            name="Entretien militaire",
-            value=f"${result['income']['military_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="Entretien des infrastructures",
-            value=f"${result['income']['improvement_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="Dépenses totales",
-            value=f"${result['income']['gross_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        # Ajouter les informations sur le revenu net
-        embed.add_field(
-            name="Revenu net",
-            value=f"${result['income']['net_income']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="Revenu net avec ressources",
-            value=f"${result['income']['monetary_net_income']:,.2f}",
-            inline=True
-        )
+        # Revenus, dépenses et revenu net, dans l'ordre du tableau
+        for name, key in NATION_INCOME_FIELDS:
+            embed.add_field(name=name, value=format_money(result['income'][key]), inline=True)
         
         # Ajouter un pied de page
         embed.set_footer(text=f"Données récupérées le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -2632,10 +3299,12 @@ async def alliance_revenue_command(ctx, alliance_id: int):
         alliance_id (int): ID de l'alliance à analyser
     """
     try:
-        message = await ctx.send(f"⏳ Calcul du revenu pour l'alliance ID {alliance_id}. Cela va prendre un moment pour traiter tous les membres...")
+        message = await ctx.send(f"⏳ Calcul du revenu pour l'alliance ID {alliance_id}...")
         
         # Calculer le revenu
-        result = await calculate_alliance_revenue(alliance_id)
+        start_time = time.perf_counter()
+        result = await calculate_alliance_revenue(alliance_id, top_k=10)
+        elapsed = time.perf_counter() - start_time
         
         if "error" in result:
             await message.edit(content=f"❌ Erreur: {result['error']}")
@@ -2657,56 +3326,11 @@ async def alliance_revenue_command(ctx, alliance_id: int):
         )
         
         # Ajouter les revenus et dépenses
-        embed.add_field(
-            name="💰 Revenus fiscaux",
-            value=f"${result['income']['gross_income']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="🎨 Bonus de couleur",
-            value=f"${result['income']['color_bonus']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="💵 Revenus bruts",
-            value=f"${result['income']['gross_total']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="⚔️ Dépenses militaires",
-            value=f"${result['income']['military_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="🏙️ Dépenses d'infrastructure",
-            value=f"${result['income']['improvement_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="💸 Dépenses totales",
-            value=f"${result['income']['gross_upkeep']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="📈 Revenus nets",
-            value=f"${result['income']['net_income']:,.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="💎 Revenus totaux (avec ressources)",
-            value=f"${result['income']['monetary_net_income']:,.2f}",
-            inline=True
-        )
+        for name, key in ALLIANCE_INCOME_FIELDS:
+            embed.add_field(name=name, value=format_money(result['income'][key]), inline=True)
         
         # Ajouter un pied de page
-        embed.set_footer(text=f"Généré le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Temps de calcul: plusieurs minutes")
+        embed.set_footer(text=f"Généré le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Temps de calcul: {elapsed:.1f} s")
         
         await message.edit(content="✅ Calcul terminé! Voici les résultats:", embed=embed)
         
@@ -2721,32 +3345,28 @@ async def alliance_revenue_command(ctx, alliance_id: int):
         
         # Générer un graphique pour les principales ressources produites (optionnel)
         try:
-            # Extraire les 5 ressources les plus produites en valeur
-            resource_values = [(r, result['monetary_resources'][r]['value']) for r in result['monetary_resources']]
-            resource_values.sort(key=lambda x: x[1], reverse=True)
-            top_resources = resource_values[:5]
+            # Extraire les 5 ressources les plus produites en valeur (sélection partielle, sans tri complet)
+            top_resources = heapq.nlargest(
+                5,
+                ((resource, data['value']) for resource, data in result['monetary_resources'].items()),
+                key=operator.itemgetter(1)
+            )
             
             if top_resources:
-                labels = [r[0].capitalize() for r in top_resources]
-                values = [r[1] for r in top_resources]
-                
-                plt.figure(figsize=(10, 6))
-                plt.bar(labels, values, color='gold')
-                plt.title(f'Top 5 des ressources produites par {result["alliance_name"]}')
-                plt.ylabel('Valeur journalière ($)')
-                plt.xticks(rotation=45)
-                plt.tight_layout()
+                labels = [resource.capitalize() for resource, _ in top_resources]
+                values = [value for _, value in top_resources]
                 
-                # Sauvegarder le graphique
-                chart_filename = f'alliance_{alliance_id}_resources.png'
-                plt.savefig(chart_filename)
-                plt.close()
+                # Rendu hors de la boucle d'événements
+                buf = await render_graph(
+                    render_bar_graph,
+                    labels,
+                    values,
+                    f'Top 5 des ressources produites par {result["alliance_name"]}',
+                    'Valeur journalière ($)'
+                )
                 
                 # Envoyer le graphique
-                await ctx.send(file=discord.File(chart_filename))
-                
-                # Supprimer le fichier temporaire
-                os.remove(chart_filename)
+                await ctx.send(file=discord.File(buf, filename=f'alliance_{alliance_id}_resources.png'))
         except Exception as chart_error:
             print(f"Erreur lors de la génération du graphique: {chart_error}")
         
@@ -2755,19 +3375,16 @@ async def alliance_revenue_command(ctx, alliance_id: int):
         print(f"Error in alliance_revenue_command: {e}")
 
 @bot.command(name='tax_history')
-async def tax_history_command(ctx, alliance_id: int, days: int = 14):
+async def tax_history_command(ctx, alliance_id: int, days: commands.Range[int, 1, 14] = 14):
     """
     Affiche l'historique des revenus fiscaux d'une alliance.
     
     Args:
         ctx: Contexte Discord
         alliance_id (int): ID de l'alliance
-        days (int): Nombre de jours d'historique à analyser (max 14)
+        days (int): Nombre de jours d'historique à analyser (1 à 14, vérifié par discord.py)
     """
     try:
-        # Limiter à 14 jours maximum (limite de l'API)
-        days = min(days, 14)
-        
         message = await ctx.send(f"⏳ Récupération et traitement des données fiscales pour l'alliance ID {alliance_id}...")
         
         # Récupérer et traiter les données
@@ -2785,21 +3402,23 @@ async def tax_history_command(ctx, alliance_id: int, days: int = 14):
             description=f"Résumé des {len(tax_data['daily_records'])} derniers jours"
         )
         
-        # Calculer les totaux sur la période
-        total_money = sum(day["money"] for day in tax_data["daily_records"])
-        total_value = sum(day["total_value"] for day in tax_data["daily_records"])
-        total_taxes = sum(day["count"] for day in tax_data["daily_records"])
+        # Calculer les totaux sur la période, en un seul passage sur les jours
+        total_money = total_value = total_taxes = 0
+        for day in tax_data["daily_records"]:
+            total_money += day["money"]
+            total_value += day["total_value"]
+            total_taxes += day["count"]
         
         # Ajouter les champs récapitulatifs
         embed.add_field(
             name="💰 Argent collecté",
-            value=f"${total_money:,.2f}",
+            value=format_money(total_money),
             inline=True
         )
         
         embed.add_field(
             name="💎 Valeur totale",
-            value=f"${total_value:,.2f}",
+            value=format_money(total_value),
             inline=True
         )
         
@@ -2814,7 +3433,7 @@ async def tax_history_command(ctx, alliance_id: int, days: int = 14):
         if days_count > 0:
             embed.add_field(
                 name="📊 Moyenne journalière",
-                value=f"${total_value / days_count:,.2f}",
+                value=format_money(total_value / days_count),
                 inline=True
             )
         
@@ -2823,24 +3442,22 @@ async def tax_history_command(ctx, alliance_id: int, days: int = 14):
         
         await message.edit(content="", embed=embed)
         
-    except Exception as e:
-        await ctx.send(f"❌ Une erreur s'est produite: {str(e)}")
+    except (FileNotFoundError, KeyError, aiohttp.ClientError) as e:
+        # Erreurs attendues (API, fichier ou données incomplètes) : message générique, détail dans les logs
+        await ctx.send("❌ Impossible de récupérer ou de traiter les données fiscales. Réessayez plus tard.")
         print(f"Error in tax_history_command: {e}")
 
 @bot.command(name='tax_graph')
-async def tax_graph_command(ctx, alliance_id: int, days: int = 14):
+async def tax_graph_command(ctx, alliance_id: int, days: commands.Range[int, 1, 14] = 14):
     """
     Génère un graphique des revenus fiscaux d'une alliance au fil du temps.
     
     Args:
         ctx: Contexte Discord
         alliance_id (int): ID de l'alliance
-        days (int): Nombre de jours d'historique à analyser (max 14)
+        days (int): Nombre de jours d'historique à analyser (1 à 14, vérifié par discord.py)
     """
     try:
-        # Limiter à 14 jours maximum
-        days = min(days, 14)
-        
         message = await ctx.send(f"⏳ Génération du graphique pour l'alliance ID {alliance_id}...")
         
         # Récupérer les données
@@ -2850,59 +3467,45 @@ async def tax_graph_command(ctx, alliance_id: int, days: int = 14):
             await message.edit(content=f"❌ Aucun enregistrement fiscal trouvé pour {tax_data['alliance_name']} dans les {days} derniers jours.")
             return
         
-        # Extraire les données pour le graphique
-        dates = [record["date"] for record in tax_data["daily_records"]]
+        # Extraire les données pour le graphique (de vraies dates, pas des catégories : axe daté,
+        # nombre d'étiquettes borné par le localisateur automatique)
+        dates = np.array([record["date"] for record in tax_data["daily_records"]], dtype='datetime64[D]')
         values = [record["total_value"] for record in tax_data["daily_records"]]
         money_values = [record["money"] for record in tax_data["daily_records"]]
         
-        # Créer le graphique
-        plt.figure(figsize=(12, 6))
-        
-        # Tracer les deux lignes
-        plt.plot(dates, values, marker='o', linestyle='-', color='gold', label='Valeur totale')
-        plt.plot(dates, money_values, marker='s', linestyle='-', color='green', label='Argent uniquement')
-        
-        plt.title(f'Revenus fiscaux journaliers de {tax_data["alliance_name"]}')
-        plt.xlabel('Date')
-        plt.ylabel('Valeur ($)')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        
-        # Formater les étiquettes
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Sauvegarder le graphique
-        temp_filename = f'tax_history_{alliance_id}.png'
-        plt.savefig(temp_filename)
-        plt.close()
+        # Créer le graphique avec les deux lignes, hors de la boucle d'événements
+        buf = await render_graph(
+            render_line_graph,
+            [
+                (dates, values, {'marker': 'o', 'linestyle': '-', 'color': 'gold', 'label': 'Valeur totale'}),
+                (dates, money_values, {'marker': 's', 'linestyle': '-', 'color': 'green', 'label': 'Argent uniquement'}),
+            ],
+            f'Revenus fiscaux journaliers de {tax_data["alliance_name"]}',
+            'Valeur ($)',
+            figsize=(12, 6),
+            legend=True
+        )
         
         # Envoyer le graphique
         await message.edit(content=f"📊 Revenus fiscaux de {tax_data['alliance_name']} sur les {len(dates)} derniers jours")
-        await ctx.send(file=discord.File(temp_filename))
-        
-        # Supprimer le fichier temporaire
-        os.remove(temp_filename)
+        await ctx.send(file=discord.File(buf, filename=f'tax_history_{alliance_id}.png'))
         
-    except Exception as e:
-        await ctx.send(f"❌ Une erreur s'est produite: {str(e)}")
+    except (FileNotFoundError, KeyError, aiohttp.ClientError) as e:
+        # Erreurs attendues (API, fichier ou données incomplètes) : message générique, détail dans les logs
+        await ctx.send("❌ Impossible de récupérer ou de traiter les données fiscales. Réessayez plus tard.")
         print(f"Error in tax_graph_command: {e}")
 
 @bot.command(name='compare_tax_bank')
-async def compare_tax_bank_command(ctx, alliance_id: int, days: int = 14):
+async def compare_tax_bank_command(ctx, alliance_id: int, days: commands.Range[int, 1, 14] = 14):
     """
     Compare les revenus fiscaux avec la valeur de la banque de l'alliance.
     
     Args:
         ctx: Contexte Discord
         alliance_id (int): ID de l'alliance
-        days (int): Nombre de jours d'historique à analyser (max 14)
+        days (int): Nombre de jours d'historique à analyser (1 à 14, vérifié par discord.py)
     """
     try:
-        # Limiter à 14 jours maximum
-        days = min(days, 14)
-        
         message = await ctx.send(f"⏳ Génération de la comparaison pour l'alliance ID {alliance_id}...")
         
         # Récupérer les données fiscales
@@ -2913,58 +3516,50 @@ async def compare_tax_bank_command(ctx, alliance_id: int, days: int = 14):
             return
         
         # Récupérer les données de banque depuis l'historique
-        history_data = load_bank_history()
+        history_data = await aload_bank_history()
         
         # Filtrer les enregistrements de banque pour la même période
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        bank_records = [
-            record for record in history_data.get("bank_records", [])
-            if record["timestamp"].split()[0] >= cutoff_date
-        ]
-        
-        # Organiser les données de banque par jour
-        bank_by_day = {}
-        for record in bank_records:
-            date_str = record["timestamp"].split()[0]
-            if date_str not in bank_by_day or record["resources"]["total_value"] > bank_by_day[date_str]["value"]:
-                bank_by_day[date_str] = {
-                    "date": date_str,
-                    "value": record["resources"]["total_value"]
-                }
-        
-        # Créer le graphique
-        plt.figure(figsize=(12, 6))
+        bank_records = bank_records_since(history_data, cutoff_date)
         
         # Données fiscales
         tax_dates = [record["date"] for record in tax_data["daily_records"]]
         tax_values = [record["total_value"] for record in tax_data["daily_records"]]
         
-        # Données bancaires
-        bank_dates = [data["date"] for date_str, data in sorted(bank_by_day.items())]
-        bank_values = [data["value"] for date_str, data in sorted(bank_by_day.items())]
+        # Données bancaires : valeur maximale par jour, en une réduction par tranche de jours.
+        # Les enregistrements sont déjà triés, donc chaque jour forme une tranche contiguë
+        bank_dates, bank_values = [], []
+        if bank_records:
+            record_days = np.array([record["timestamp"][:10] for record in bank_records])
+            record_values = np.fromiter(
+                (record["resources"]["total_value"] for record in bank_records),
+                dtype=np.float64,
+                count=len(bank_records)
+            )
+            unique_days, day_starts = np.unique(record_days, return_index=True)
+            bank_dates = unique_days.tolist()
+            bank_values = np.maximum.reduceat(record_values, day_starts).tolist()
         
-        # Tracer les revenus fiscaux
-        plt.plot(tax_dates, tax_values, marker='o', linestyle='-', color='gold', label='Revenus fiscaux')
+        # Tracer les revenus fiscaux, sur un axe daté commun aux deux courbes
+        lines = [(np.array(tax_dates, dtype='datetime64[D]'), tax_values, {'marker': 'o', 'linestyle': '-', 'color': 'gold', 'label': 'Revenus fiscaux'})]
         
         # Tracer la valeur de la banque si disponible
         if bank_dates:
-            plt.plot(bank_dates, bank_values, marker='s', linestyle='-', color='blue', label='Valeur de la banque')
-        
-        plt.title(f'Comparaison revenus fiscaux vs. banque - {tax_data["alliance_name"]}')
-        plt.xlabel('Date')
-        plt.ylabel('Valeur ($)')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        
-        # Formater les étiquettes
-        plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.StrMethodFormatter('{x:,.0f}'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Sauvegarder le graphique
-        temp_filename = f'tax_bank_comparison_{alliance_id}.png'
-        plt.savefig(temp_filename)
-        plt.close()
+            lines.append((np.array(bank_dates, dtype='datetime64[D]'), bank_values, {'marker': 's', 'linestyle': '-', 'color': 'blue', 'label': 'Valeur de la banque'}))
+        
+        # Créer le graphique hors de la boucle d'événements, ou reprendre l'image déjà rendue
+        # si la commande est relancée sur exactement les mêmes données
+        title = f'Comparaison revenus fiscaux vs. banque - {tax_data["alliance_name"]}'
+        png_key = ("compare_tax_bank", title, tuple(tax_dates), tuple(tax_values), tuple(bank_dates), tuple(bank_values))
+        buf = await render_graph_cached(
+            png_key,
+            render_line_graph,
+            lines,
+            title,
+            'Valeur ($)',
+            figsize=(12, 6),
+            legend=True
+        )
         
         # Envoyer le graphique
         comparison_text = "Revenus fiscaux vs. Valeur de la banque"
@@ -2972,13 +3567,11 @@ async def compare_tax_bank_command(ctx, alliance_id: int, days: int = 14):
             comparison_text += " (aucune donnée bancaire disponible)"
         
         await message.edit(content=f"📊 {comparison_text} pour {tax_data['alliance_name']}")
-        await ctx.send(file=discord.File(temp_filename))
-        
-        # Supprimer le fichier temporaire
-        os.remove(temp_filename)
+        await ctx.send(file=discord.File(buf, filename=f'tax_bank_comparison_{alliance_id}.png'))
         
-    except Exception as e:
-        await ctx.send(f"❌ Une erreur s'est produite: {str(e)}")
+    except (FileNotFoundError, KeyError, aiohttp.ClientError) as e:
+        # Erreurs attendues (API, fichier ou données incomplètes) : message générique, détail dans les logs
+        await ctx.send("❌ Impossible de récupérer ou de traiter les données fiscales. Réessayez plus tard.")
         print(f"Error in compare_tax_bank_command: {e}")
 
 # Error handlers
@@ -2996,23 +3589,41 @@ async def command_error(ctx, error):
         await ctx.send(f"❌ An error occurred: {str(error)}")
         print(f"Error in command {ctx.command.name}: {error}")
 
+@tax_history_command.error
+@tax_graph_command.error
+@compare_tax_bank_command.error
+async def tax_command_error(ctx, error):
+    """Gestionnaire d'erreurs des commandes fiscales : arguments refusés et erreurs inattendues des commandes."""
+    if isinstance(error, commands.RangeError):
+        await ctx.send(f"❌ Le nombre de jours doit être compris entre 1 et 14. Utilisation : !{ctx.command.name} <alliance_id> [jours (1 à 14)]")
+    elif isinstance(error, commands.BadArgument):
+        await ctx.send(f"❌ Arguments invalides. Utilisation : !{ctx.command.name} <alliance_id> [jours (1 à 14)]")
+    elif isinstance(error, commands.MissingRequiredArgument):
+        await ctx.send(f"❌ Argument manquant : {error.param.name}. Utilisation : !{ctx.command.name} <alliance_id> [jours (1 à 14)]")
+    else:
+        # Erreur levée dans le corps de la commande : le détail reste dans les logs, pas dans le salon
+        await ctx.send("❌ Une erreur s'est produite lors de l'exécution de la commande.")
+        print(f"Error in command {ctx.command.name}: {getattr(error, 'original', error)}")
+
+# The help text never changes: build its embed once at import
+HELP_EMBED = discord.Embed(
+    title="Alliance Bank and Resources Tracker Commands",
+    description="Available commands for tracking alliance bank and member resources data",
+    color=discord.Color.blue()
+)
+HELP_EMBED.add_field(name="!scan_history [days] [channel_id]", value="Scans message history for $get_bank commands", inline=False)
+HELP_EMBED.add_field(name="!bank_history [days]", value="Shows bank history summary (default: 7 days)", inline=False)
+HELP_EMBED.add_field(name="!bank_graph [days]", value="Graphs bank value over time (default: 30 days)", inline=False)
+HELP_EMBED.add_field(name="!set_alliance_id <alliance_id>", value="Sets alliance ID for member resources tracking", inline=False)
+HELP_EMBED.add_field(name="!member_resources_history [days]", value="Shows member resources history (default: 7 days)", inline=False)
+HELP_EMBED.add_field(name="!member_resources_graph [days]", value="Graphs member resources value (default: 30 days)", inline=False)
+HELP_EMBED.add_field(name="!compare_bank_members [days]", value="Compares bank and member resources values (default: 30 days)", inline=False)
+HELP_EMBED.set_footer(text="Bot captures $get_bank data automatically")
+
 @bot.command(name='help_bank')
 async def show_help(ctx):
     """Display help information for bank tracking commands."""
-    embed = discord.Embed(
-        title="Alliance Bank and Resources Tracker Commands",
-        description="Available commands for tracking alliance bank and member resources data",
-        color=discord.Color.blue()
-    )
-    embed.add_field(name="!scan_history [days] [channel_id]", value="Scans message history for $get_bank commands", inline=False)
-    embed.add_field(name="!bank_history [days]", value="Shows bank history summary (default: 7 days)", inline=False)
-    embed.add_field(name="!bank_graph [days]", value="Graphs bank value over time (default: 30 days)", inline=False)
-    embed.add_field(name="!set_alliance_id <alliance_id>", value="Sets alliance ID for member resources tracking", inline=False)
-    embed.add_field(name="!member_resources_history [days]", value="Shows member resources history (default: 7 days)", inline=False)
-    embed.add_field(name="!member_resources_graph [days]", value="Graphs member resources value (default: 30 days)", inline=False)
-    embed.add_field(name="!compare_bank_members [days]", value="Compares bank and member resources values (default: 30 days)", inline=False)
-    embed.set_footer(text="Bot captures $get_bank data automatically")
-    await ctx.send(embed=embed)
+    await ctx.send(embed=HELP_EMBED)
 
 if __name__ == "__main__":
     if not os.path.exists('.env'):
@@ -3021,9 +3632,12 @@ if __name__ == "__main__":
         print("Created .env file. Please add your Discord token and optionally your P&W API key.")
     
     if not os.path.exists(BANK_HISTORY_FILE):
-        with open(BANK_HISTORY_FILE, 'w') as f:
-            json.dump({"alliance_id": None, "bank_records": [], "member_resources_records": []}, f)
+        with open(BANK_HISTORY_FILE, 'wb') as f:
+            f.write(orjson.dumps({"alliance_id": None}))
         print(f"Created empty {BANK_HISTORY_FILE} file.")
+    else:
+        migrate_member_resources_records()
+        migrate_bank_records()
     
     if DISCORD_TOKEN and DISCORD_TOKEN != "your_discord_token_here":
         bot.run(DISCORD_TOKEN)